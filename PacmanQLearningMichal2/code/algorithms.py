@@ -1,3 +1,4 @@
+import heapq
 import sys
 
 def dijkstra(nodes, start_node):
@@ -21,7 +22,7 @@ def dijkstra(nodes, start_node):
         neighbors = nodes.getNeighbors(current_min_node)
         for neighbor in neighbors:
             tentative_value = shortest_path[current_min_node] + 1 #nodes.value(current_min_node, neighbor)
-            if tentative_value < shortest_path[neighbor]:
+            if neighbor in shortest_path and tentative_value < shortest_path[neighbor]:
                 shortest_path[neighbor] = tentative_value
                 # We also update the best path to the current node
                 previous_nodes[neighbor] = current_min_node
@@ -85,4 +86,73 @@ def dijkstra_or_a_star(nodes, start_node, a_star=False):
  
         # After visiting its neighbors, we mark the node as "visited"
         unvisited_nodes.remove(current_min_node)
-    return previous_nodes, shortest_path
\ No newline at end of file
+    return previous_nodes, shortest_path
+
+#########
+# Heap-based versions. Edges cost their length in pixels, which is what
+# dijkstra_or_a_star(a_star=True) effectively computes, or 1 per edge with
+# weighted=False like dijkstra. The manhattan heuristic never overestimates
+# pixel lengths (portal edges cost the full width they jump), so A* is exact.
+def neighbor_costs(nodes, node, weighted=True):
+    keys = nodes.nodeKeys
+    neighbors = nodes.getWeightedNeighbors()[nodes.getNodeId(node)]
+    return [(keys[target], cost if weighted else 1) for target, cost in neighbors]
+
+
+def dijkstra_heap(nodes, start_node, target_node=None, weighted=True):
+    shortest_path = {start_node: 0}
+    previous_nodes = {}
+    visited = set()
+    queue = [(0, 0, start_node)]
+    counter = 1  # tie breaker so nodes themselves are never compared
+    while queue:
+        cost, _, current = heapq.heappop(queue)
+        if current in visited:
+            continue
+        visited.add(current)
+        if current == target_node:
+            break
+        for neighbor, edge in neighbor_costs(nodes, current, weighted):
+            tentative_value = cost + edge
+            if tentative_value < shortest_path.get(neighbor, sys.maxsize):
+                shortest_path[neighbor] = tentative_value
+                previous_nodes[neighbor] = current
+                heapq.heappush(queue, (tentative_value, counter, neighbor))
+                counter += 1
+    return previous_nodes, shortest_path
+
+
+def a_star(nodes, start_node, target_node):
+    shortest_path = {start_node: 0}
+    previous_nodes = {}
+    visited = set()
+    queue = [(heuristic(start_node, target_node), 0, start_node)]
+    counter = 1
+    while queue:
+        _, _, current = heapq.heappop(queue)
+        if current in visited:
+            continue
+        visited.add(current)
+        if current == target_node:
+            break
+        for neighbor, edge in neighbor_costs(nodes, current):
+            tentative_value = shortest_path[current] + edge
+            if tentative_value < shortest_path.get(neighbor, sys.maxsize):
+                shortest_path[neighbor] = tentative_value
+                previous_nodes[neighbor] = current
+                f = tentative_value + heuristic(neighbor, target_node)
+                heapq.heappush(queue, (f, counter, neighbor))
+                counter += 1
+    return previous_nodes, shortest_path
+
+
+def reconstruct_path(previous_nodes, start_node, target_node):
+    path = [target_node]
+    node = target_node
+    while node != start_node:
+        if node not in previous_nodes:
+            return []
+        node = previous_nodes[node]
+        path.append(node)
+    path.reverse()
+    return path
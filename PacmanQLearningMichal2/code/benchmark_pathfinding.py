@@ -0,0 +1,70 @@
+import random
+import time
+
+from algorithms import (
+    a_star,
+    dijkstra,
+    dijkstra_heap,
+    dijkstra_or_a_star,
+)
+from mazedata import MazeData
+from nodes import NodeGroup
+
+
+# Compares the list-scanning pathfinding functions with the heap-based ones on
+# random start/target pairs, and checks that they agree on path lengths.
+def loadNodes(level):
+    mazedata = MazeData()
+    mazedata.loadMaze(level)
+    nodes = NodeGroup(mazedata.obj.name + ".txt")
+    mazedata.obj.setPortalPairs(nodes)
+    mazedata.obj.connectHomeNodes(nodes)
+    # NodeGroup builds costs before the home nodes exist; rebuild it so the
+    # old functions search the same graph as the new ones
+    nodes.costs = nodes.get_nodes()
+    return mazedata.obj.name, nodes
+
+
+def timeQueries(function, pairs):
+    results = []
+    start = time.perf_counter()
+    for start_node, target_node in pairs:
+        previous_nodes, shortest_path = function(start_node, target_node)
+        results.append(shortest_path.get(target_node))
+    return (time.perf_counter() - start) / len(pairs), results
+
+
+def benchmark(level, queries=20):
+    name, nodes = loadNodes(level)
+    keys = nodes.getListOfNodesVector()
+    pairs = [(random.choice(keys), random.choice(keys)) for _ in range(queries)]
+
+    weighted = {
+        "dijkstra_or_a_star(a_star=True)": lambda s, t: dijkstra_or_a_star(
+            nodes, s, a_star=True
+        ),
+        "dijkstra_heap": lambda s, t: dijkstra_heap(nodes, s, t),
+        "a_star": lambda s, t: a_star(nodes, s, t),
+    }
+    unit = {
+        "dijkstra": lambda s, t: dijkstra(nodes, s),
+        "dijkstra_heap(weighted=False)": lambda s, t: dijkstra_heap(
+            nodes, s, t, weighted=False
+        ),
+    }
+
+    print("{}: {} nodes, {} queries".format(name, len(keys), queries))
+    for group in [weighted, unit]:
+        reference = None
+        for label, function in group.items():
+            seconds, results = timeQueries(function, pairs)
+            if reference is None:
+                reference = results
+            agrees = "ok" if results == reference else "MISMATCH"
+            print("  {:<34} {:>9.3f} ms/query  {}".format(label, seconds * 1000, agrees))
+
+
+if __name__ == "__main__":
+    random.seed(0)
+    benchmark(0)
+    benchmark(1)
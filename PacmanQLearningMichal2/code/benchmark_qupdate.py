@@ -0,0 +1,70 @@
+import random
+import time
+
+import numpy as np
+
+from qlearning import (
+    ACTIONCODES,
+    CODEACTIONS,
+    NUMSTATES,
+    Action,
+    DenseQValueStore,
+    QValueStore,
+    State,
+    updateQValue,
+)
+
+
+# Compares the scalar Q-update (updateQValue, one transition at a time) with
+# the stores' updateBatch on the same random transitions, in updates per second.
+def randomTransitions(count, rng):
+    return (
+        rng.integers(0, NUMSTATES, count),
+        rng.integers(0, len(ACTIONCODES), count),
+        rng.normal(size=count).astype(np.float32),
+        rng.integers(0, NUMSTATES, count),
+        rng.random(count) < 0.05,
+        rng.random((count, len(ACTIONCODES))) < 0.6,
+    )
+
+
+def timeScalar(store, transitions):
+    states, actions, rewards, nextStates, dones, nextActions = transitions
+    batch = []
+    for i in range(len(states)):
+        newActions = [Action(CODEACTIONS[code]) for code in np.flatnonzero(nextActions[i])]
+        batch.append(
+            (
+                State.decode(int(states[i])),
+                Action(CODEACTIONS[int(actions[i])]),
+                float(rewards[i]),
+                State.decode(int(nextStates[i])),
+                newActions or [Action.UP],
+            )
+        )
+    start = time.perf_counter()
+    for state, action, reward, newState, newActions in batch:
+        updateQValue(store, state, action, reward, newState, newActions, 0.7, 0.75)
+    return len(batch) / (time.perf_counter() - start)
+
+
+def timeBatch(store, transitions, batchSize):
+    count = len(transitions[0])
+    start = time.perf_counter()
+    for first in range(0, count, batchSize):
+        store.updateBatch(*[array[first : first + batchSize] for array in transitions], 0.7, 0.75)
+    return count / (time.perf_counter() - start)
+
+
+if __name__ == "__main__":
+    random.seed(0)
+    rng = np.random.default_rng(0)
+    small = randomTransitions(20000, rng)
+    large = randomTransitions(2000000, rng)
+    print("{:<40} {:>14}".format("", "updates/s"))
+    print("{:<40} {:>14,.0f}".format("updateQValue, dict store", timeScalar(QValueStore(None), small)))
+    print("{:<40} {:>14,.0f}".format("updateQValue, dense store", timeScalar(DenseQValueStore(None), small)))
+    print("{:<40} {:>14,.0f}".format("updateBatch(32), dict store", timeBatch(QValueStore(None), small, 32)))
+    for batchSize in [32, 1024, 65536]:
+        label = "updateBatch({}), dense store".format(batchSize)
+        print("{:<40} {:>14,.0f}".format(label, timeBatch(DenseQValueStore(None), large, batchSize)))
@@ -0,0 +1,86 @@
+import random
+import time
+
+import numpy as np
+
+from constants import DOWN, LEFT, NCOLS, NROWS, RIGHT, TILEHEIGHT, TILEWIDTH, UP
+from entity import Entity
+from run import GameController
+from soacore import EntityArrays
+
+
+# Moves Pac-Man and the ghosts of many headless games both as Entity objects
+# and with EntityArrays, checks every frame that they agree, and compares how
+# many entity updates per second each manages. Ghosts steer towards fixed
+# random goals and Pac-Man changes his learnt direction now and then, so the
+# run doesn't depend on modes, pellets or the random module.
+def makeGames(count):
+    games = []
+    for _ in range(count):
+        game = GameController(headless=True)
+        game.startGameRandom()
+        for ghost in game.ghosts:
+            ghost.directionMethod = ghost.goalDirection
+            ghost.goal.set(random.randrange(TILEWIDTH * NCOLS), random.randrange(TILEHEIGHT * NROWS))
+        games.append(game)
+    return games
+
+
+def entitiesOf(game):
+    return [game.pacman] + list(game.ghosts)
+
+
+def compare(games, arrays, collisions):
+    for g, game in enumerate(games):
+        for row, entity in zip(arrays.rows(g), entitiesOf(game)):
+            if (
+                not np.allclose(arrays.position[row], entity.position.asTuple())
+                or arrays.direction[row] != entity.direction
+                or arrays.node[row] != entity.node.id
+                or arrays.target[row] != entity.target.id
+            ):
+                return False
+        expected = [game.pacman.collideCheck(ghost) for ghost in game.ghosts]
+        if collisions[g].tolist() != expected:
+            return False
+    return True
+
+
+def run(count, frames, dt=1.0 / 30, check=True):
+    random.seed(count)
+    games = makeGames(count)
+    arrays = EntityArrays(games[0].nodes, count)
+    for g, game in enumerate(games):
+        arrays.load(g, entitiesOf(game), game.nodes)
+    turns = [[random.choice([UP, DOWN, LEFT, RIGHT]) for _ in games] for _ in range(frames)]
+
+    objectTime = arrayTime = 0.0
+    agree = True
+    for frame in range(frames):
+        for g, game in enumerate(games):
+            if frame % 20 == 0:
+                game.pacman.learntDirection = turns[frame][g]
+                arrays.learntDirection[g * arrays.entitiesPerGame] = turns[frame][g]
+        start = time.perf_counter()
+        for game in games:
+            game.pacman.update(dt)
+            for ghost in game.ghosts:
+                Entity.update(ghost, dt)
+        objectTime += time.perf_counter() - start
+        start = time.perf_counter()
+        collisions = arrays.step(dt)
+        arrayTime += time.perf_counter() - start
+        if check and agree:
+            agree = compare(games, arrays, collisions)
+
+    updates = count * arrays.entitiesPerGame * frames
+    print(
+        "{:>4} games: objects {:>10,.0f} entity updates/s, arrays {:>12,.0f}/s  {}".format(
+            count, updates / objectTime, updates / arrayTime, "ok" if agree else "MISMATCH"
+        )
+    )
+
+
+if __name__ == "__main__":
+    for count in [1, 16, 256]:
+        run(count, 600)
@@ -0,0 +1,69 @@
+import random
+import time
+import timeit
+
+import vector
+from vector import Vector2
+
+
+# Counts the Vector2 objects created per simulated frame of a headless game,
+# and times the per-frame entity operations written with the allocating
+# operators against the in-place methods that replaced them.
+def vectorsPerFrame(frames=3000):
+    from run import GameController
+
+    created = [0]
+    init = Vector2.__init__
+
+    def countingInit(self, x=0, y=0):
+        created[0] += 1
+        init(self, x, y)
+
+    random.seed(0)
+    game = GameController(headless=True)
+    game.startGame()
+    vector.Vector2.__init__ = countingInit
+    try:
+        start = time.perf_counter()
+        for _ in range(frames):
+            game.update()
+        seconds = time.perf_counter() - start
+    finally:
+        vector.Vector2.__init__ = init
+    return created[0] / frames, frames / seconds
+
+
+def timeOperations(number=200000):
+    position = Vector2(100.0, 200.0)
+    node = Vector2(96, 208)
+    direction = Vector2(0, -1)
+    out = Vector2()
+    speed, dt = 100.0, 1.0 / 30
+    cases = [
+        (
+            "move",
+            lambda: position + direction * speed * dt,
+            lambda: position.iaddScaled(direction, speed * dt),
+        ),
+        (
+            "distance",
+            lambda: (position - node).magnitudeSquared(),
+            lambda: position.distanceSquared(node),
+        ),
+        (
+            "goal offset",
+            lambda: (node + direction * 16 - position).magnitudeSquared(),
+            lambda: out.setFrom(node).iaddScaled(direction, 16).distanceSquared(position),
+        ),
+    ]
+    for label, allocating, inPlace in cases:
+        before = timeit.timeit(allocating, number=number) / number * 1e9
+        after = timeit.timeit(inPlace, number=number) / number * 1e9
+        print("  {:<12} {:>8.0f} ns  {:>8.0f} ns".format(label, before, after))
+
+
+if __name__ == "__main__":
+    print("{:<14} {:>11}  {:>11}".format("", "operators", "in place"))
+    timeOperations()
+    perFrame, fps = vectorsPerFrame()
+    print("Vector2 objects created per frame: {:.1f} ({:.0f} frames/s)".format(perFrame, fps))
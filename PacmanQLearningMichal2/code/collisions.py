@@ -0,0 +1,57 @@
+# Spatial hash of the things moving along the maze that Pac-Man can run into
+# (the ghosts and the fruit), keyed by the tile of a node (Node.tile). Each is
+# filed under the tiles of the nodes at both ends of the edge it's on, and
+# files itself again (Entity.updateCell) whenever it moves on to another
+# edge, not every frame. Nodes sit on tiles and edges join the nearest nodes
+# in a row or column, so two points less than a tile apart on the maze's
+# edges are on edges that share a node. Collide radii add up to less than a
+# tile, so everything that can touch Pac-Man is filed under his node's or his
+# target's tile, and near() only has to look in those two cells.
+class CollisionGrid(object):
+    def __init__(self):
+        self.cells = {}
+        self.tiles = {}
+
+    def place(self, entity):
+        tiles = (entity.node.tile, entity.target.tile)
+        old = self.tiles.get(entity)
+        if old == tiles:
+            return
+        if old is not None:
+            self.unfile(entity, old)
+        self.tiles[entity] = tiles
+        for tile in tiles:
+            cell = self.cells.get(tile)
+            if cell is None:
+                cell = self.cells[tile] = set()
+            cell.add(entity)
+
+    def remove(self, entity):
+        old = self.tiles.pop(entity, None)
+        if old is not None:
+            self.unfile(entity, old)
+
+    def unfile(self, entity, tiles):
+        for tile in tiles:
+            # both ends are the same tile when the entity sits on a node
+            cell = self.cells.get(tile)
+            if cell is not None:
+                cell.discard(entity)
+                if not cell:
+                    del self.cells[tile]
+
+    # What might touch entity: everything filed under the tiles of the nodes
+    # at either end of its edge. An empty tuple if there is nothing.
+    def near(self, entity):
+        cells = self.cells
+        first = cells.get(entity.node.tile)
+        second = cells.get(entity.target.tile)
+        if first is None:
+            return second or ()
+        if second is None or second is first:
+            return first
+        return first | second
+
+    def clear(self):
+        self.cells = {}
+        self.tiles = {}
@@ -0,0 +1,76 @@
+from collections import deque
+
+from constants import CHASE, DOWN, LEFT, RIGHT, SCATTER, UP
+
+# how many nodes ahead of Pac-Man a direction's danger looks
+LOOKAHEAD = 6
+# danger distance of nodes no active ghost can reach
+NOGHOST = 255
+
+
+# Hop distance from every maze node to the nearest ghost that is hunting
+# Pac-Man (SCATTER or CHASE), found with a multi-source BFS from the ghosts'
+# target nodes. The ghost house is left out, both as a source and as a way
+# through. The BFS only reruns when the set of those target nodes changes,
+# which happens when a ghost reaches a node or changes mode.
+class GhostDangerField(object):
+    def __init__(self, nodes):
+        self.houseNodes = nodes.houseNodes
+        offsets, targets, directions = nodes.getNeighborArrays()
+        self.adjacency = []
+        for node in range(len(nodes.nodeKeys)):
+            neighbors = targets[offsets[node] : offsets[node + 1]].tolist()
+            self.adjacency.append([n for n in neighbors if n not in self.houseNodes])
+
+        # rays[direction][id]: the ids of the next LOOKAHEAD nodes straight ahead
+        self.rays = {}
+        for direction in [UP, DOWN, LEFT, RIGHT]:
+            self.rays[direction] = []
+            for node in nodes.nodeList:
+                ray = []
+                while len(ray) < LOOKAHEAD and node.neighbors[direction] is not None:
+                    node = node.neighbors[direction]
+                    ray.append(node.id)
+                self.rays[direction].append(tuple(ray))
+
+        self.sources = None
+        self.distance = [NOGHOST] * len(nodes.nodeKeys)
+
+    def update(self, ghosts):
+        sources = tuple(
+            sorted(
+                ghost.target.id
+                for ghost in ghosts
+                if ghost.mode.current in [SCATTER, CHASE]
+                and ghost.target.id not in self.houseNodes
+            )
+        )
+        if sources == self.sources:
+            return
+        self.sources = sources
+        distance = [NOGHOST] * len(self.distance)
+        queue = deque()
+        for node in sources:
+            distance[node] = 0
+            queue.append(node)
+        while queue:
+            node = queue.popleft()
+            for neighbor in self.adjacency[node]:
+                if distance[neighbor] == NOGHOST:
+                    distance[neighbor] = distance[node] + 1
+                    queue.append(neighbor)
+        self.distance = distance
+
+    # The danger of heading from node (an id) in direction: the fewest hops
+    # between a hunting ghost and any of the next LOOKAHEAD nodes, so 0 means
+    # a ghost is heading for one of them and NOGHOST means none can get there.
+    def getDanger(self, node, direction):
+        distance = self.distance
+        return min([distance[i] for i in self.rays[direction][node]], default=NOGHOST)
+
+    def isSafe(self, node, direction):
+        distance = self.distance
+        for i in self.rays[direction][node]:
+            if distance[i] == 0:
+                return False
+        return True
@@ -23,7 +23,11 @@ class Entity(object):
         self.visible = True
         self.disablePortal = False
         self.goal = None
+        # reused for intermediate results in goalDirection
+        self.scratch = Vector2()
         self.directionMethod = self.randomDirection
+        # CollisionGrid the entity keeps itself filed in, see joinGrid()
+        self.collisions = None
         self.setStartNode(node)
         self.image: pygame.Surface
 
@@ -31,7 +35,7 @@ class Entity(object):
         self.position = self.node.position.copy()
 
     def update(self, dt):
-        self.position += self.directions[self.direction] * self.speed * dt
+        self.position.iaddScaled(self.directions[self.direction], self.speed * dt)
 
         if self.overshotTarget():
             self.node = self.target
@@ -48,6 +52,7 @@ class Entity(object):
                 self.target = self.getNewTarget(self.direction)
 
             self.setPosition()
+            self.updateCell()
 
     def validDirection(self, direction):
         if direction is not STOP:
@@ -63,10 +68,8 @@ class Entity(object):
 
     def overshotTarget(self):
         if self.target is not None:
-            vec1 = self.target.position - self.node.position
-            vec2 = self.position - self.node.position
-            node2Target = vec1.magnitudeSquared()
-            node2Self = vec2.magnitudeSquared()
+            node2Target = self.target.position.distanceSquared(self.node.position)
+            node2Self = self.position.distanceSquared(self.node.position)
             return node2Self >= node2Target
         return False
 
@@ -75,6 +78,7 @@ class Entity(object):
         temp = self.node
         self.node = self.target
         self.target = temp
+        self.updateCell()
 
     def oppositeDirection(self, direction):
         if direction is not STOP:
@@ -97,11 +101,10 @@ class Entity(object):
 
     def goalDirection(self, directions):
         distances = []
+        vec = self.scratch
         for direction in directions:
-            vec = (
-                self.node.position + self.directions[direction] * TILEWIDTH - self.goal
-            )
-            distances.append(vec.magnitudeSquared())
+            vec.setFrom(self.node.position).iaddScaled(self.directions[direction], TILEWIDTH)
+            distances.append(vec.distanceSquared(self.goal))
         index = distances.index(min(distances))
         return directions[index]
 
@@ -110,11 +113,23 @@ class Entity(object):
         self.startNode = node
         self.target = node
         self.setPosition()
+        self.updateCell()
 
     def setBetweenNodes(self, direction):
         if self.node.neighbors[direction] is not None:
             self.target = self.node.neighbors[direction]
             self.position = (self.node.position + self.target.position) / 2.0
+            self.updateCell()
+
+    # Files the entity in grid, which it then keeps up to date whenever its
+    # node or target changes.
+    def joinGrid(self, grid):
+        self.collisions = grid
+        grid.place(self)
+
+    def updateCell(self):
+        if self.collisions is not None:
+            self.collisions.place(self)
 
     def reset(self):
         self.setStartNode(self.startNode)
@@ -122,6 +137,35 @@ class Entity(object):
         self.speed = 100
         self.visible = True
 
+    # Simulation state as plain values, with nodes stored by id, so that
+    # GameController.snapshot can put the entity back where it was.
+    def snapshot(self):
+        return {
+            "node": self.node.id,
+            "target": self.target.id,
+            "startNode": self.startNode.id,
+            "position": self.position.asTuple(),
+            "direction": self.direction,
+            "speed": self.speed,
+            "visible": self.visible,
+            "disablePortal": self.disablePortal,
+            "goal": None if self.goal is None else self.goal.asTuple(),
+            "directionMethod": self.directionMethod.__name__,
+        }
+
+    def restore(self, state, nodes):
+        self.node = nodes.nodeList[state["node"]]
+        self.target = nodes.nodeList[state["target"]]
+        self.startNode = nodes.nodeList[state["startNode"]]
+        self.position = Vector2(*state["position"])
+        self.direction = state["direction"]
+        self.speed = state["speed"]
+        self.visible = state["visible"]
+        self.disablePortal = state["disablePortal"]
+        self.goal = None if state["goal"] is None else Vector2(*state["goal"])
+        self.directionMethod = getattr(self, state["directionMethod"])
+        self.updateCell()
+
     def setSpeed(self, speed):
         self.speed = speed * TILEWIDTH / 16
 
@@ -0,0 +1,32 @@
+from constants import DOWN, LEFT, RIGHT, UP
+
+# How each state feature is read off a GameController, by name.
+FEATURES = {
+    "playerPosition": lambda game: game.pacmanPosition(),
+    "leftSafe": lambda game: game.getNodesSafe(LEFT),
+    "rightSafe": lambda game: game.getNodesSafe(RIGHT),
+    "upSafe": lambda game: game.getNodesSafe(UP),
+    "downSafe": lambda game: game.getNodesSafe(DOWN),
+    "pelletDirection": lambda game: game.getPelletDirection(),
+    "validDirections": lambda game: tuple(game.pacman.validDirections()),
+}
+
+
+# Computes features on demand and remembers them until the game's tick changes,
+# so a feature asked for several times in one learning step (building the
+# state, listing the actions, the reward) is only computed once, and features
+# nobody asks for are never computed.
+class FeatureCache(object):
+    def __init__(self, game, features=FEATURES):
+        self.game = game
+        self.features = features
+        self.tick = None
+        self.values = {}
+
+    def get(self, name):
+        if self.game.tick != self.tick:
+            self.tick = self.game.tick
+            self.values = {}
+        if name not in self.values:
+            self.values[name] = self.features[name](self.game)
+        return self.values[name]
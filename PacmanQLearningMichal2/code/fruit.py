@@ -3,19 +3,27 @@ from constants import FRUIT, GREEN, RIGHT
 from sprites import FruitSprites
 
 
+# The fruit's lifespan is booked on timers, the Scheduler it ages on.
 class Fruit(Entity):
-    def __init__(self, node, level=0):
+    def __init__(self, node, timers, level=0):
         Entity.__init__(self, node)
         self.name = FRUIT
         self.color = GREEN
         self.lifespan = 5
-        self.timer = 0
         self.destroy = False
         self.points = 100 + level * 20
         self.setBetweenNodes(RIGHT)
         self.sprites = FruitSprites(self, level)
+        self.event = timers.afterTime(self.lifespan, self.expire)
 
-    def update(self, dt):
-        self.timer += dt
-        if self.timer >= self.lifespan:
-            self.destroy = True
+    def expire(self):
+        self.destroy = True
+
+    def snapshot(self):
+        state = Entity.snapshot(self)
+        state["destroy"] = self.destroy
+        return state
+
+    def restore(self, state, nodes):
+        Entity.restore(self, state, nodes)
+        self.destroy = state["destroy"]
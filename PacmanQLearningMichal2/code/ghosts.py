@@ -25,14 +25,17 @@ from sprites import GhostSprites
 
 
 class Ghost(Entity):
-    def __init__(self, node, pacman: Entity):
+    def __init__(self, node, pacman: Entity, timers):
         Entity.__init__(self, node)
         self.name = GHOST
         self.points = 200
         self.goal = Vector2()
+        # scatter() and chase() write the goal into this vector instead of
+        # allocating one every frame; spawn() points goal at a node instead
+        self.goalBuffer = Vector2()
         self.directionMethod = self.goalDirection
         self.pacman = pacman
-        self.mode = ModeController(self)
+        self.mode = ModeController(self, timers)
         self.homeNode = node
         self.sprites: GhostSprites
 
@@ -41,9 +44,24 @@ class Ghost(Entity):
         self.points = 200
         self.directionMethod = self.goalDirection
 
+    def snapshot(self):
+        state = Entity.snapshot(self)
+        state["points"] = self.points
+        state["homeNode"] = self.homeNode.id
+        state["spawnNode"] = self.spawnNode.id
+        state["mode"] = self.mode.snapshot()
+        return state
+
+    def restore(self, state, nodes):
+        Entity.restore(self, state, nodes)
+        self.points = state["points"]
+        self.homeNode = nodes.nodeList[state["homeNode"]]
+        self.spawnNode = nodes.nodeList[state["spawnNode"]]
+        self.mode.restore(state["mode"])
+
+    # sprites are updated separately, before the frame's mode timers run out
     def update(self, dt):
-        self.sprites.update(dt)
-        self.mode.update(dt)
+        self.mode.update()
         if self.mode.current is SCATTER:
             self.scatter()
         elif self.mode.current is CHASE:
@@ -51,10 +69,10 @@ class Ghost(Entity):
         Entity.update(self, dt)
 
     def scatter(self):
-        self.goal = Vector2()
+        self.goal = self.goalBuffer.set(0, 0)
 
     def chase(self):
-        self.goal = self.pacman.position
+        self.goal = self.goalBuffer.setFrom(self.pacman.position)
 
     def spawn(self):
         self.goal = self.spawnNode.position
@@ -82,82 +100,83 @@ class Ghost(Entity):
 
 
 class Blinky(Ghost):
-    def __init__(self, node, pacman=None):
-        Ghost.__init__(self, node, pacman)
+    def __init__(self, node, pacman, timers):
+        Ghost.__init__(self, node, pacman, timers)
         self.name = BLINKY
         self.color = RED
         self.sprites = GhostSprites(self)
 
 
 class Pinky(Ghost):
-    def __init__(self, node, pacman=None):
-        Ghost.__init__(self, node, pacman)
+    def __init__(self, node, pacman, timers):
+        Ghost.__init__(self, node, pacman, timers)
         self.name = PINKY
         self.color = PINK
         self.sprites = GhostSprites(self)
 
     def scatter(self):
-        self.goal = Vector2(TILEWIDTH * NCOLS, 0)
+        self.goal = self.goalBuffer.set(TILEWIDTH * NCOLS, 0)
 
     def chase(self):
-        self.goal = (
-            self.pacman.position
-            + self.pacman.directions[self.pacman.direction] * TILEWIDTH * 4
+        self.goal = self.goalBuffer.setFrom(self.pacman.position).iaddScaled(
+            self.pacman.directions[self.pacman.direction], TILEWIDTH * 4
         )
 
 
 class Inky(Ghost):
-    def __init__(self, node, pacman: Entity, blinky: Entity):
-        Ghost.__init__(self, node, pacman)
+    def __init__(self, node, pacman: Entity, blinky: Entity, timers):
+        Ghost.__init__(self, node, pacman, timers)
         self.name = INKY
         self.color = TEAL
         self.sprites = GhostSprites(self)
         self.blinky = blinky
 
     def scatter(self):
-        self.goal = Vector2(TILEWIDTH * NCOLS, TILEHEIGHT * NROWS)
+        self.goal = self.goalBuffer.set(TILEWIDTH * NCOLS, TILEHEIGHT * NROWS)
 
     def chase(self):
-        vec1 = (
-            self.pacman.position
-            + self.pacman.directions[self.pacman.direction] * TILEWIDTH * 2
+        # blinky + 2 * (two tiles ahead of pacman - blinky)
+        self.goal = (
+            self.goalBuffer.setFrom(self.pacman.position)
+            .iaddScaled(self.pacman.directions[self.pacman.direction], TILEWIDTH * 2)
+            .isub(self.blinky.position)
+            .imul(2)
+            .iadd(self.blinky.position)
         )
-        vec2 = (vec1 - self.blinky.position) * 2
-        self.goal = self.blinky.position + vec2
 
 
 class Clyde(Ghost):
-    def __init__(self, node, pacman: Entity):
+    def __init__(self, node, pacman: Entity, timers):
         Ghost.__init__(
             self,
             node,
             pacman,
+            timers,
         )
         self.name = CLYDE
         self.color = ORANGE
         self.sprites = GhostSprites(self)
 
     def scatter(self):
-        self.goal = Vector2(0, TILEHEIGHT * NROWS)
+        self.goal = self.goalBuffer.set(0, TILEHEIGHT * NROWS)
 
     def chase(self):
-        d = self.pacman.position - self.position
-        ds = d.magnitudeSquared()
+        ds = self.pacman.position.distanceSquared(self.position)
         if ds <= (TILEWIDTH * 8) ** 2:
             self.scatter()
         else:
-            self.goal = (
-                self.pacman.position
-                + self.pacman.directions[self.pacman.direction] * TILEWIDTH * 4
+            self.goal = self.goalBuffer.setFrom(self.pacman.position).iaddScaled(
+                self.pacman.directions[self.pacman.direction], TILEWIDTH * 4
             )
 
 
+# timers is the Scheduler the ghosts' mode timers are booked on.
 class GhostGroup(object):
-    def __init__(self, node, pacman):
-        self.blinky = Blinky(node, pacman)
-        self.pinky = Pinky(node, pacman)
-        self.inky = Inky(node, pacman, self.blinky)
-        self.clyde = Clyde(node, pacman)
+    def __init__(self, node, pacman, timers):
+        self.blinky = Blinky(node, pacman, timers)
+        self.pinky = Pinky(node, pacman, timers)
+        self.inky = Inky(node, pacman, self.blinky, timers)
+        self.clyde = Clyde(node, pacman, timers)
         self.ghosts = [self.blinky, self.pinky, self.inky, self.clyde]
 
     def __iter__(self):
@@ -167,6 +186,10 @@ class GhostGroup(object):
         for ghost in self:
             ghost.update(dt)
 
+    def updateSprites(self, dt):
+        for ghost in self:
+            ghost.sprites.update(dt)
+
     def startFreight(self):
         for ghost in self:
             ghost.startFreight()
@@ -0,0 +1,140 @@
+import hashlib
+import os
+
+import numpy as np
+
+from constants import DOWN, LEFT, PORTAL, RIGHT, UP
+from nodes import NodeGroup
+
+# bump when the compiled layout changes so stale bundles are rebuilt
+COMPILERVERSION = 1
+NEIGHBORDIRECTIONS = [UP, DOWN, LEFT, RIGHT, PORTAL]
+
+
+# A maze parsed once into arrays: the maze and rotation text, the node graph
+# with its portals and home nodes already wired, and the pellet layout.
+# NodeGroup, PelletGroup and MazeSprites build themselves from it instead of
+# re-reading and re-scanning the text files on every (re)start.
+class CompiledMaze(object):
+    def __init__(
+        self, data, rotdata, nodeKeys, neighbors, gridNodes, homekey, gridEdges, pellets
+    ):
+        self.data = data
+        self.rotdata = rotdata
+        # nodeKeys[id] is a node's (x,y); neighbors[id] holds the neighbor ids in
+        # NEIGHBORDIRECTIONS order (-1 for none). Ids below gridNodes come from
+        # the maze file, the rest are the home nodes.
+        self.nodeKeys = nodeKeys
+        self.neighbors = neighbors
+        self.gridNodes = gridNodes
+        self.homekey = homekey
+        # which directions of the grid nodes had an edge before the wiring,
+        # needed to rebuild NodeGroup.costs
+        self.gridEdges = gridEdges
+        # one (row, col, isPowerPellet) row per pellet, in maze file order
+        self.pellets = pellets
+
+
+# compiled mazes already loaded in this process, keyed by bundle hash
+loaded = {}
+
+
+def mazeHash(maze):
+    h = hashlib.sha1(str(COMPILERVERSION).encode())
+    for textfile in [maze.name + ".txt", maze.name + "_rotation.txt"]:
+        with open(textfile, "rb") as f:
+            h.update(f.read())
+    wiring = (
+        sorted(maze.portalPairs.items()),
+        maze.homeoffset,
+        maze.homenodeconnectLeft,
+        maze.homenodeconnectRight,
+    )
+    h.update(repr(wiring).encode())
+    return h.hexdigest()
+
+
+# Returns the compiled form of a MazeBase object, from memory, from its
+# <name>_compiled.npz bundle, or by compiling the text files.
+def loadCompiledMaze(maze):
+    key = mazeHash(maze)
+    if key in loaded:
+        return loaded[key]
+    cachefile = maze.name + "_compiled.npz"
+    compiled = readBundle(cachefile, key)
+    if compiled is None:
+        compiled = compileMaze(maze)
+        writeBundle(cachefile, key, compiled)
+    loaded[key] = compiled
+    return compiled
+
+
+def compileMaze(maze):
+    data = np.loadtxt(maze.name + ".txt", dtype="<U1")
+    rotdata = np.loadtxt(maze.name + "_rotation.txt", dtype="<U1")
+
+    nodes = NodeGroup(maze.name + ".txt", data=data)
+    gridNodes = len(nodes.nodeList)
+    gridEdges = np.array(
+        [[cost is not None for cost in costs] for costs in nodes.costs.values()],
+        dtype=np.bool_,
+    )
+    maze.setPortalPairs(nodes)
+    maze.connectHomeNodes(nodes)
+    neighbors = np.full((len(nodes.nodeList), len(NEIGHBORDIRECTIONS)), -1, dtype=np.int32)
+    for node in nodes.nodeList:
+        for i, direction in enumerate(NEIGHBORDIRECTIONS):
+            if node.neighbors[direction] is not None:
+                neighbors[node.id, i] = node.neighbors[direction].id
+
+    pellets = []
+    for row in range(data.shape[0]):
+        for col in range(data.shape[1]):
+            if data[row][col] in [".", "+"]:
+                pellets.append((row, col, 0))
+            elif data[row][col] in ["P", "p"]:
+                pellets.append((row, col, 1))
+
+    return CompiledMaze(
+        data,
+        rotdata,
+        np.array(nodes.nodeKeys, dtype=np.float64),
+        neighbors,
+        gridNodes,
+        nodes.nodeIds[nodes.homekey],
+        gridEdges,
+        np.array(pellets, dtype=np.int32).reshape(-1, 3),
+    )
+
+
+def readBundle(cachefile, key):
+    if not os.path.exists(cachefile):
+        return None
+    bundle = np.load(cachefile)
+    if str(bundle["key"]) != key:
+        return None
+    return CompiledMaze(
+        bundle["data"],
+        bundle["rotdata"],
+        bundle["nodeKeys"],
+        bundle["neighbors"],
+        int(bundle["gridNodes"]),
+        int(bundle["homekey"]),
+        bundle["gridEdges"],
+        bundle["pellets"],
+    )
+
+
+def writeBundle(cachefile, key, compiled):
+    np.savez(
+        cachefile,
+        key=key,
+        data=compiled.data,
+        rotdata=compiled.rotdata,
+        nodeKeys=compiled.nodeKeys,
+        neighbors=compiled.neighbors,
+        gridNodes=compiled.gridNodes,
+        homekey=compiled.homekey,
+        gridEdges=compiled.gridEdges,
+        pellets=compiled.pellets,
+    )
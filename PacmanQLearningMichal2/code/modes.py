@@ -1,62 +1,94 @@
 from constants import FREIGHT, SCATTER, CHASE, SPAWN
 
 
+# Scatter and chase take turns, each switch booked on the ghosts' timers for
+# when the current one runs out. onSwitch is told after every switch.
 class MainMode(object):
-    def __init__(self):
-        self.timer = 0
+    def __init__(self, timers, onSwitch=None):
+        self.timers = timers
+        self.onSwitch = onSwitch
+        self.event = None
         self.scatter()
 
-    def update(self, dt):
-        self.timer += dt
-        if self.timer >= self.time:
-            if self.mode is SCATTER:
-                self.chase()
-            elif self.mode is CHASE:
-                self.scatter()
+    def switch(self):
+        if self.mode is SCATTER:
+            self.chase()
+        elif self.mode is CHASE:
+            self.scatter()
+        if self.onSwitch is not None:
+            self.onSwitch()
 
     def scatter(self):
         self.mode = SCATTER
         self.time = 7
-        self.timer = 0
+        self.event = self.timers.afterTime(self.time, self.switch)
 
     def chase(self):
         self.mode = CHASE
         self.time = 20
-        self.timer = 0
+        self.event = self.timers.afterTime(self.time, self.switch)
 
 
+# timers is the Scheduler of frames the ghosts move in: main mode switches and
+# the end of freight are booked on it instead of counted out every frame.
 class ModeController(object):
-    def __init__(self, entity):
-        self.timer = 0
+    def __init__(self, entity, timers):
+        self.timers = timers
+        self.event = None
         self.time = None
-        self.mainmode = MainMode()
+        self.mainmode = MainMode(timers, self.mainModeSwitched)
         self.current = self.mainmode.mode
         self.entity = entity
 
-    def update(self, dt):
-        self.mainmode.update(dt)
-        if self.current is FREIGHT:
-            self.timer += dt
-            if self.timer >= self.time:
-                self.time = None
-                self.entity.normalMode()
-                self.current = self.mainmode.mode
-        elif self.current in [SCATTER, CHASE]:
-            self.current = self.mainmode.mode
-
+    # A spawning ghost goes back to normal once it's home; the only mode
+    # change that depends on where the ghost is rather than on a timer.
+    def update(self):
         if self.current is SPAWN:
             if self.entity.node == self.entity.spawnNode:
                 self.entity.normalMode()
                 self.current = self.mainmode.mode
 
+    def mainModeSwitched(self):
+        if self.current in [SCATTER, CHASE]:
+            self.current = self.mainmode.mode
+
+    def freightOver(self):
+        self.event = None
+        self.time = None
+        self.entity.normalMode()
+        self.current = self.mainmode.mode
+
+    def snapshot(self):
+        return (
+            self.current,
+            self.event,
+            self.time,
+            self.mainmode.mode,
+            self.mainmode.event,
+            self.mainmode.time,
+        )
+
+    def restore(self, state):
+        (
+            self.current,
+            self.event,
+            self.time,
+            self.mainmode.mode,
+            self.mainmode.event,
+            self.mainmode.time,
+        ) = state
+
     def setFreightMode(self):
         if self.current in [SCATTER, CHASE]:
-            self.timer = 0
             self.time = 7
             self.current = FREIGHT
+            self.event = self.timers.afterTime(self.time, self.freightOver)
         elif self.current is FREIGHT:
-            self.timer = 0
+            self.timers.cancel(self.event)
+            self.event = self.timers.afterTime(self.time, self.freightOver)
 
     def setSpawnMode(self):
         if self.current is FREIGHT:
+            self.timers.cancel(self.event)
+            self.event = None
             self.current = SPAWN
@@ -16,25 +16,36 @@ from constants import (
     INKY,
     CLYDE,
     FRUIT,
+    NCOLS,
     WHITE,
 )
 import numpy as np
+from algorithms import heuristic
 
 
 class Node(object):
     def __init__(self, x, y):
         self.position = Vector2(x, y)
+        self.id = -1
+        # index (row * NCOLS + col) of the tile the node is on, for CollisionGrid
+        self.tile = int(round(y / TILEHEIGHT)) * NCOLS + int(round(x / TILEWIDTH))
         self.neighbors = {UP: None, DOWN: None, LEFT: None, RIGHT: None, PORTAL: None}
+        self.resetAccess()
+
+    def resetAccess(self):
         self.access = {
             UP: [PACMAN, BLINKY, PINKY, INKY, CLYDE, FRUIT],
             DOWN: [PACMAN, BLINKY, PINKY, INKY, CLYDE, FRUIT],
             LEFT: [PACMAN, BLINKY, PINKY, INKY, CLYDE, FRUIT],
             RIGHT: [PACMAN, BLINKY, PINKY, INKY, CLYDE, FRUIT],
         }
+        # set once any access was denied, so snapshots can skip untouched nodes
+        self.restricted = False
 
     def denyAccess(self, direction, entity):
         if entity.name in self.access[direction]:
             self.access[direction].remove(entity.name)
+            self.restricted = True
 
     def allowAccess(self, direction, entity):
         if entity.name not in self.access[direction]:
@@ -50,18 +61,47 @@ class Node(object):
 
 
 class NodeGroup(object):
-    def __init__(self, level):
+    # data: the already parsed maze file. compiled: a CompiledMaze (see
+    # mazecache.py) whose graph, portals and home nodes are already wired.
+    def __init__(self, level, data=None, compiled=None):
         self.level = level
         self.nodesLUT = {}
+        # dense integer ids: nodeList[id] is the node, nodeKeys[id] its (x,y) key
+        self.nodeList = []
+        self.nodeKeys = []
+        self.nodeIds = {}
+        self.adjacency = None
+        # (adjacency it was built from, weighted neighbor lists)
+        self.weightedAdjacency = None
         self.nodeSymbols = ["+", "P", "n", "."]
         self.pathSymbols = [".", "-", "|", "p"]
-        data = self.readMazeFile(level)
+        self.homekey = None
+        # ids of the nodes inside the ghost house (the home nodes below homekey)
+        self.houseNodes = set()
+        if compiled is not None:
+            self.loadCompiled(compiled)
+            return
+        if data is None:
+            data = self.readMazeFile(level)
         self.createNodeTable(data)
         self.connectHorizontally(data)
         self.connectVertically(data)
-        self.homekey = None
         self.costs = self.get_nodes()
 
+    def loadCompiled(self, compiled):
+        for x, y in compiled.nodeKeys.tolist():
+            self.addNode((int(x) if x.is_integer() else x, int(y) if y.is_integer() else y))
+        for node, neighbors in zip(self.nodeList, compiled.neighbors.tolist()):
+            for direction, id in zip([UP, DOWN, LEFT, RIGHT, PORTAL], neighbors):
+                if id >= 0:
+                    node.neighbors[direction] = self.nodeList[id]
+        self.homekey = self.nodeKeys[compiled.homekey]
+        self.houseNodes = set(range(compiled.gridNodes, len(self.nodeList))) - {compiled.homekey}
+        # what get_nodes() returned before the portals and home nodes were wired
+        self.costs = {}
+        for key, edges in zip(self.nodeKeys, compiled.gridEdges.tolist()):
+            self.costs[key] = [1 if edge else None for edge in edges]
+
 
     # returns a list of all nodes in (x,y) format
     def getListOfNodesVector(self):
@@ -69,9 +109,61 @@ class NodeGroup(object):
 
     # returns a node in (x,y) format
     def getVectorFromLUTNode(self, node):
-        id = list(self.nodesLUT.values()).index(node)
-        listOfVectors = self.getListOfNodesVector()
-        return listOfVectors[id]
+        return self.nodeKeys[node.id]
+
+    def getNodeId(self, key):
+        return self.nodeIds[key]
+
+    def addNode(self, key):
+        node = Node(*key)
+        if key in self.nodeIds:
+            node.id = self.nodeIds[key]
+            self.nodeList[node.id] = node
+        else:
+            node.id = len(self.nodeList)
+            self.nodeList.append(node)
+            self.nodeKeys.append(key)
+            self.nodeIds[key] = node.id
+        self.nodesLUT[key] = node
+        self.adjacency = None
+
+    # CSR neighbor arrays indexed by node id: the neighbors of node i are
+    # targets[offsets[i]:offsets[i + 1]], reached by moving in directions[...]
+    # (UP, DOWN, LEFT, RIGHT or PORTAL). Rebuilt after the graph changes.
+    def getNeighborArrays(self):
+        if self.adjacency is None:
+            offsets = [0]
+            targets = []
+            directions = []
+            for node in self.nodeList:
+                for direction, neighbor in node.neighbors.items():
+                    if neighbor is not None:
+                        targets.append(neighbor.id)
+                        directions.append(direction)
+                offsets.append(len(targets))
+            self.adjacency = (
+                np.array(offsets, dtype=np.int32),
+                np.array(targets, dtype=np.int32),
+                np.array(directions, dtype=np.int8),
+            )
+        return self.adjacency
+
+    # The same graph with edge lengths: for node i a list of (target id,
+    # manhattan distance in pixels) pairs, the edge weight every weighted
+    # search over the maze uses. Rebuilt along with getNeighborArrays().
+    def getWeightedNeighbors(self):
+        adjacency = self.getNeighborArrays()
+        if self.weightedAdjacency is None or self.weightedAdjacency[0] is not adjacency:
+            offsets, targets, directions = adjacency
+            keys = self.nodeKeys
+            weighted = []
+            for node in range(len(keys)):
+                weighted.append([
+                    (target, heuristic(keys[node], keys[target]))
+                    for target in targets[offsets[node] : offsets[node + 1]].tolist()
+                ])
+            self.weightedAdjacency = (adjacency, weighted)
+        return self.weightedAdjacency[1]
     
     def readMazeFile(self, textfile):
         return np.loadtxt(textfile, dtype="<U1")
@@ -80,13 +172,13 @@ class NodeGroup(object):
         for row in list(range(data.shape[0])):
             for col in list(range(data.shape[1])):
                 if data[row][col] in self.nodeSymbols:
-                    x, y = self.constructKey(col + xoffset, row + yoffset)
-                    self.nodesLUT[(x, y)] = Node(x, y)
+                    self.addNode(self.constructKey(col + xoffset, row + yoffset))
 
     def constructKey(self, x, y):
         return x * TILEWIDTH, y * TILEHEIGHT
 
     def connectHorizontally(self, data, xoffset=0, yoffset=0):
+        self.adjacency = None
         for row in list(range(data.shape[0])):
             key = None
             for col in list(range(data.shape[1])):
@@ -102,6 +194,7 @@ class NodeGroup(object):
                     key = None
 
     def connectVertically(self, data, xoffset=0, yoffset=0):
+        self.adjacency = None
         dataT = data.transpose()
         for col in list(range(dataT.shape[0])):
             key = None
@@ -127,6 +220,7 @@ class NodeGroup(object):
         if key1 in self.nodesLUT.keys() and key2 in self.nodesLUT.keys():
             self.nodesLUT[key1].neighbors[PORTAL] = self.nodesLUT[key2]
             self.nodesLUT[key2].neighbors[PORTAL] = self.nodesLUT[key1]
+            self.adjacency = None
 
     def createHomeNodes(self, xoffset, yoffset):
         homedata = np.array(
@@ -143,12 +237,17 @@ class NodeGroup(object):
         self.connectHorizontally(homedata, xoffset, yoffset)
         self.connectVertically(homedata, xoffset, yoffset)
         self.homekey = self.constructKey(xoffset + 2, yoffset)
+        for row in range(1, homedata.shape[0]):
+            for col in range(homedata.shape[1]):
+                if homedata[row][col] in self.nodeSymbols:
+                    self.houseNodes.add(self.nodeIds[self.constructKey(col + xoffset, row + yoffset)])
         return self.homekey
 
     def connectHomeNodes(self, homekey, otherkey, direction):
         key = self.constructKey(*otherkey)
         self.nodesLUT[homekey].neighbors[direction] = self.nodesLUT[key]
         self.nodesLUT[key].neighbors[direction * -1] = self.nodesLUT[homekey]
+        self.adjacency = None
 
     def getNodeFromPixels(self, xpixel, ypixel):
         if (xpixel, ypixel) in self.nodesLUT.keys():
@@ -31,17 +31,28 @@ class Pacman(Entity):
         self.image = self.sprites.getStartImage()
         self.sprites.reset()
 
+    def snapshot(self):
+        state = Entity.snapshot(self)
+        state["alive"] = self.alive
+        state["learntDirection"] = self.learntDirection
+        state["lastNode"] = self.lastNode.id
+        return state
+
+    def restore(self, state, nodes):
+        Entity.restore(self, state, nodes)
+        self.alive = state["alive"]
+        self.learntDirection = state["learntDirection"]
+        self.lastNode = nodes.nodeList[state["lastNode"]]
+
     def die(self):
         self.alive = False
         self.direction = STOP
 
     def update(self, dt):
-        print("UDPATRE PACMAN", self.position.x, self.position.y)
         self.sprites.update(dt)
 
-        self.position += self.directions[self.direction] * self.speed * dt
+        self.position.iaddScaled(self.directions[self.direction], self.speed * dt)
         if self.overshotTarget():
-            print('OVRESHOT TARGET')
             # print("LEARNT DIRECTION", self.learntDirection)
             # print("self.direction", self.direction)
             self.node = self.target
@@ -57,6 +68,7 @@ class Pacman(Entity):
             else:
                 self.target = self.getNewTarget(self.direction)
             self.setPosition()
+            self.updateCell()
         # else:
         #     if self.oppositeDirection(direction):
         #         self.reverseDirection()
@@ -98,8 +110,7 @@ class Pacman(Entity):
         return self.collideCheck(ghost)
 
     def collideCheck(self, other):
-        d = self.position - other.position
-        dSquared = d.magnitudeSquared()
+        dSquared = self.position.distanceSquared(other.position)
         rSquared = (self.collideRadius + other.collideRadius) ** 2
         if dSquared <= rSquared:
             return True
@@ -0,0 +1,169 @@
+from __future__ import annotations
+
+import multiprocessing
+import queue
+import random
+
+from qlearning import QValueStore, ReinforcementProblem, updateQValue
+
+# Seconds the coordinator waits for an update before checking on the workers
+WORKERPOLL = 5.0
+
+
+# Runs Q-learning on its own headless game against a local copy of the table.
+# Every syncIterations it sends the changes it made since the last sync to the
+# coordinator and replaces its copy of those entries with the merged values.
+def qLearningWorker(
+    workerId: int,
+    updates,
+    refresh,
+    iterations,
+    syncIterations,
+    learningRate,
+    discountRate,
+    explorationRandomness,
+    seed: int | None,
+):
+    problem = ReinforcementProblem(headless=True, seed=seed, verbose=False)
+    store = QValueStore(None)
+    store.storage = refresh.get()
+    base = dict(store.storage)
+
+    state = problem.getRandomState()
+    i = 0
+    while i < iterations:
+        if problem.game.pause.paused:
+            problem.updateGameNTimes(1)
+            continue
+
+        actions = problem.getAvailableActions(state)
+        if random.uniform(0, 1) < explorationRandomness:
+            action = random.choice(actions)
+        else:
+            action = store.getBestAction(state, actions)
+
+        reward, newState = problem.takeAction(state, action)
+        updateQValue(
+            store,
+            state,
+            action,
+            reward,
+            newState,
+            problem.getAvailableActions(newState),
+            learningRate,
+            discountRate,
+        )
+        state = newState
+        i += 1
+
+        finished = i == iterations
+        if i % syncIterations == 0 or finished:
+            deltas = {}
+            for key, value in store.storage.items():
+                delta = value - base.get(key, 0.0)
+                if delta != 0.0:
+                    deltas[key] = delta
+            updates.put((workerId, deltas, finished))
+            if not finished:
+                store.storage.update(refresh.get())
+                base = dict(store.storage)
+
+
+# Raises if a worker that hasn't finished has exited, after stopping the rest.
+# Only called once no update arrived for a while, so anything a worker sent
+# before exiting has been received.
+def checkWorkers(workers, running):
+    for workerId in running:
+        worker = workers[workerId]
+        if not worker.is_alive():
+            for other in workers:
+                if other.is_alive():
+                    other.terminate()
+            raise RuntimeError(
+                "Worker {} exited with code {} before finishing".format(workerId, worker.exitcode)
+            )
+
+
+# Trains numWorkers processes in parallel, each running `iterations` steps.
+# The coordinator (this process) adds every worker's deltas to the shared
+# store and answers with the entries that changed since that worker last
+# synced, so workers keep learning from each other's experience. A worker
+# that dies before it finishes stops the run with a RuntimeError instead of
+# leaving the coordinator waiting for it.
+def ParallelQLearning(
+    store: QValueStore,
+    numWorkers,
+    iterations,
+    learningRate,
+    discountRate,
+    explorationRandomness,
+    syncIterations=100,
+    saveSyncs=50,
+    seed: int | None = None,
+):
+    updates = multiprocessing.Queue()
+    refreshQueues = [multiprocessing.Queue() for _ in range(numWorkers)]
+    workers = []
+    for workerId in range(numWorkers):
+        worker = multiprocessing.Process(
+            target=qLearningWorker,
+            args=(
+                workerId,
+                updates,
+                refreshQueues[workerId],
+                iterations,
+                syncIterations,
+                learningRate,
+                discountRate,
+                explorationRandomness,
+                None if seed is None else seed + workerId,
+            ),
+        )
+        worker.start()
+        workers.append(worker)
+    for refresh in refreshQueues:
+        refresh.put(dict(store.storage))
+
+    # keys changed in each version of the shared table that some worker
+    # still running hasn't been sent yet
+    changes: dict[int, list] = {}
+    lastSync = [0] * numWorkers
+    running = set(range(numWorkers))
+    version = 0
+    # versions up to this one have been dropped from changes
+    pruned = 0
+    while running:
+        try:
+            workerId, deltas, finished = updates.get(timeout=WORKERPOLL)
+        except queue.Empty:
+            checkWorkers(workers, running)
+            continue
+        version += 1
+        for key, delta in deltas.items():
+            store.storage[key] = store.storage.get(key, 0.0) + delta
+        changes[version] = list(deltas)
+        if finished:
+            running.discard(workerId)
+        else:
+            keys = set()
+            for changed in range(lastSync[workerId] + 1, version + 1):
+                keys.update(changes[changed])
+            refreshQueues[workerId].put({key: store.storage[key] for key in keys})
+            lastSync[workerId] = version
+        # versions every running worker has been sent are no longer needed
+        oldest = min((lastSync[id] for id in running), default=version)
+        while pruned < oldest:
+            pruned += 1
+            del changes[pruned]
+        if version % saveSyncs == 0:
+            print("Saving at sync:", version)
+            store.save()
+
+    for worker in workers:
+        worker.join()
+    store.save()
+
+
+if __name__ == "__main__":
+    store = QValueStore("training")
+    ParallelQLearning(store, multiprocessing.cpu_count(), 100000, 0.7, 0.75, 0.9)
@@ -1,24 +1,24 @@
+# Timed pauses are booked on timers, a Scheduler that runs at the end of every
+# frame, and end there by calling func.
 class Pause(object):
-    def __init__(self, paused=False):
+    def __init__(self, timers, paused=False):
+        self.timers = timers
         self.paused = paused
-        self.timer = 0
-        self.pauseTime = None
+        self.event = None
         self.func = None
 
-    def update(self, dt):
-        if self.pauseTime is not None:
-            self.timer += dt
-            if self.timer >= self.pauseTime:
-                self.timer = 0
-                self.paused = False
-                self.pauseTime = None
-                return self.func
-        return None
+    def end(self):
+        self.event = None
+        self.paused = False
+        if self.func is not None:
+            self.func()
 
     def setPause(self, playerPaused=False, pauseTime=None, func=None):
-        self.timer = 0
+        self.timers.cancel(self.event)
+        self.event = None
         self.func = func
-        self.pauseTime = pauseTime
+        if pauseTime is not None:
+            self.event = self.timers.afterTime(pauseTime, self.end)
         self.flip()
 
     def flip(self):
@@ -0,0 +1,127 @@
+import heapq
+
+from algorithms import heuristic
+from constants import PORTAL
+
+INFINITY = float("inf")
+
+
+# Distance field from every maze node to its nearest remaining pellet, by path
+# length in pixels. It is built with one multi-source Dijkstra over the node
+# graph and repaired locally when a pellet is eaten, so the nearest pellet from
+# any node and the first step towards it are lookups.
+class PelletDistanceField(object):
+    def __init__(self, nodes, pellets):
+        self.pellets = pellets
+        offsets, targets, directions = nodes.getNeighborArrays()
+        keys = nodes.nodeKeys
+        self.adjacency = nodes.getWeightedNeighbors()
+
+        # for each pellet tile, the nodes it seeds: (node, distance, first step).
+        # A pellet on a node seeds that node; one between two nodes seeds both
+        # ends of its edge, stepping along the edge.
+        self.sources = {}
+        # the same entries grouped by node
+        self.nodeSources = [[] for _ in keys]
+        for tile, pellet in pellets.pelletTiles.items():
+            self.sources[tile] = self.findSources(nodes, pellet, offsets, targets, directions)
+            for node, distance, step in self.sources[tile]:
+                self.nodeSources[node].append((tile, distance, step))
+
+        self.distance = [INFINITY] * len(keys)
+        self.nextNode = [-1] * len(keys)
+        self.source = [None] * len(keys)
+        # the nodes whose nearest pellet is each tile
+        self.members = {tile: set() for tile in self.sources}
+        self.propagate(list(range(len(keys))))
+
+    def findSources(self, nodes, pellet, offsets, targets, directions):
+        x, y = pellet.position.x, pellet.position.y
+        if (x, y) in nodes.nodeIds:
+            node = nodes.nodeIds[(x, y)]
+            return [(node, 0, node)]
+        keys = nodes.nodeKeys
+        for node in range(len(keys)):
+            for i in range(offsets[node], offsets[node + 1]):
+                if directions[i] == PORTAL:
+                    continue
+                other = int(targets[i])
+                (x1, y1), (x2, y2) = keys[node], keys[other]
+                onVertical = x1 == x2 == x and min(y1, y2) < y < max(y1, y2)
+                onHorizontal = y1 == y2 == y and min(x1, x2) < x < max(x1, x2)
+                if onVertical or onHorizontal:
+                    return [
+                        (node, heuristic(keys[node], (x, y)), other),
+                        (other, heuristic(keys[other], (x, y)), node),
+                    ]
+        return []
+
+    def setNearest(self, node, distance, step, source):
+        if self.source[node] is not None:
+            self.members[self.source[node]].discard(node)
+        self.distance[node] = distance
+        self.nextNode[node] = step
+        self.source[node] = source
+        if source is not None:
+            self.members[source].add(node)
+
+    # Recomputes the given nodes from the pellets seeding them and from their
+    # neighbors outside the set, then lets improvements spread.
+    def propagate(self, region):
+        queue = []
+        for node in region:
+            best = (INFINITY, -1, None)
+            for tile, distance, step in self.nodeSources[node]:
+                if tile in self.sources and distance < best[0]:
+                    best = (distance, step, tile)
+            for neighbor, cost in self.adjacency[node]:
+                if self.source[neighbor] is not None and self.distance[neighbor] + cost < best[0]:
+                    best = (self.distance[neighbor] + cost, neighbor, self.source[neighbor])
+            self.setNearest(node, *best)
+            if best[2] is not None:
+                heapq.heappush(queue, (best[0], node))
+        while queue:
+            distance, node = heapq.heappop(queue)
+            if distance > self.distance[node]:
+                continue
+            for neighbor, cost in self.adjacency[node]:
+                tentative = distance + cost
+                if tentative < self.distance[neighbor]:
+                    self.setNearest(neighbor, tentative, node, self.source[node])
+                    heapq.heappush(queue, (tentative, neighbor))
+
+    # Only the nodes that were closest to the eaten pellet need recomputing.
+    def removePellet(self, pellet):
+        if pellet.tile not in self.sources:
+            return
+        del self.sources[pellet.tile]
+        region = list(self.members.pop(pellet.tile))
+        for node in region:
+            self.source[node] = None
+            self.distance[node] = INFINITY
+            self.nextNode[node] = -1
+        self.propagate(region)
+
+    # The remaining pellet closest to node (an id) by path length, or None.
+    def getNearestPellet(self, node):
+        if self.source[node] is None:
+            return None
+        return self.pellets.pelletTiles[self.source[node]]
+
+    def getNextNode(self, node):
+        return self.nextNode[node]
+
+    def snapshot(self):
+        return (dict(self.sources), list(self.distance), list(self.nextNode), list(self.source))
+
+    def restore(self, state):
+        sources, distance, nextNode, source = state
+        self.sources = dict(sources)
+        self.distance = list(distance)
+        self.nextNode = list(nextNode)
+        self.source = list(source)
+        # members is derived from source, so it is rebuilt rather than stored
+        self.members = {tile: set() for tile in self.sources}
+        for node, tile in enumerate(self.source):
+            if tile is not None:
+                self.members[tile].add(node)
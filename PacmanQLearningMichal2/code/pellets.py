@@ -1,12 +1,15 @@
 import pygame
 from vector import Vector2
-from constants import PELLET, POWERPELLET, TILEHEIGHT, TILEWIDTH, WHITE
+from constants import NCOLS, NROWS, PELLET, POWERPELLET, TILEHEIGHT, TILEWIDTH, WHITE
 import numpy as np
 
 
 class Pellet(object):
     def __init__(self, row, column):
         self.name = PELLET
+        self.row = row
+        self.column = column
+        self.tile = row * NCOLS + column
         self.position = Vector2(column * TILEWIDTH, row * TILEHEIGHT)
         self.color = WHITE
         self.radius = int(2 * TILEWIDTH / 16)
@@ -27,46 +30,98 @@ class PowerPellet(Pellet):
         self.name = POWERPELLET
         self.radius = int(8 * TILEWIDTH / 16)
         self.points = 50
-        self.flashTime = 0.2
-        self.timer = 0
 
-    def update(self, dt):
-        self.timer += dt
-        if self.timer >= self.flashTime:
-            self.visible = not self.visible
-            self.timer = 0
+    def flash(self):
+        self.visible = not self.visible
 
 
+# Remaining pellets are kept in a dict keyed by tile index (row * NCOLS + col),
+# so finding and eating the pellet under Pac-Man are O(1).
+# Power pellets flash together, on an event booked on timers every flashTime.
 class PelletGroup(object):
-    def __init__(self, pelletfile):
-        self.pelletList = []
+    def __init__(self, pelletfile, timers, compiled=None):
+        self.timers = timers
+        self.flashTime = 0.2
+        self.pelletTiles = {}
         self.powerpellets = []
-        self.createPelletList(pelletfile)
+        if compiled is not None:
+            self.createCompiledPelletList(compiled)
+        else:
+            self.createPelletList(pelletfile)
         self.numEaten = 0
+        self.flashEvent = self.timers.afterTime(self.flashTime, self.flash)
+
+    # remaining pellets, in maze file order
+    @property
+    def pelletList(self):
+        return list(self.pelletTiles.values())
 
-    def update(self, dt):
+    def __len__(self):
+        return len(self.pelletTiles)
+
+    def flash(self):
         for powerpellet in self.powerpellets:
-            powerpellet.update(dt)
+            powerpellet.flash()
+        self.flashEvent = self.timers.afterTime(self.flashTime, self.flash)
+
+    def addPellet(self, pellet):
+        self.pelletTiles[pellet.tile] = pellet
+        if pellet.name == POWERPELLET:
+            self.powerpellets.append(pellet)
+
+    def removePellet(self, pellet):
+        del self.pelletTiles[pellet.tile]
 
     def createPelletList(self, pelletfile):
         data = self.readPelletfile(pelletfile)
         for row in range(data.shape[0]):
             for col in range(data.shape[1]):
                 if data[row][col] in [".", "+"]:
-                    self.pelletList.append(Pellet(row, col))
+                    self.addPellet(Pellet(row, col))
                 elif data[row][col] in ["P", "p"]:
-                    pp = PowerPellet(row, col)
-                    self.pelletList.append(pp)
-                    self.powerpellets.append(pp)
+                    self.addPellet(PowerPellet(row, col))
+
+    def createCompiledPelletList(self, compiled):
+        for row, col, power in compiled.pellets.tolist():
+            if power:
+                self.addPellet(PowerPellet(row, col))
+            else:
+                self.addPellet(Pellet(row, col))
 
     def readPelletfile(self, textfile):
         return np.loadtxt(textfile, dtype="<U1")
 
+    # The only pellet that can touch something at position is the one on the
+    # nearest tile, since pellets sit a whole tile apart and collide within
+    # less than half a tile. Returns it in a list, or an empty list.
+    def getPelletsNear(self, position):
+        col = int(round(position.x / TILEWIDTH))
+        row = int(round(position.y / TILEHEIGHT))
+        if 0 <= col < NCOLS and 0 <= row < NROWS:
+            pellet = self.pelletTiles.get(row * NCOLS + col)
+            if pellet is not None:
+                return [pellet]
+        return []
+
+    def snapshot(self):
+        return (
+            dict(self.pelletTiles),
+            self.numEaten,
+            self.flashEvent,
+            [pp.visible for pp in self.powerpellets],
+        )
+
+    def restore(self, state):
+        pelletTiles, self.numEaten, self.flashEvent, powerpellets = state
+        self.pelletTiles = dict(pelletTiles)
+        for pp, visible in zip(self.powerpellets, powerpellets):
+            pp.visible = visible
+
     def isEmpty(self):
-        if len(self.pelletList) == 0:
+        if len(self.pelletTiles) == 0:
             return True
         return False
 
     def render(self, screen):
-        for pellet in self.pelletList:
+        for pellet in self.pelletTiles.values():
             pellet.render(screen)
@@ -7,29 +7,71 @@ from typing import TYPE_CHECKING, Any
 from enum import IntEnum
 import pickle
 import random
+import threading
+
+import numpy as np
 
 import pygame
 import time
 
 from vector import Vector2
 from run import GameController
+from features import FeatureCache
+from stateschema import ChoiceField, FlagField, PositionField, StateSchema
+from replay import ReplayBuffer
 from constants import *
 
 
+ACTIONCODES = {UP: 0, DOWN: 1, LEFT: 2, RIGHT: 3}
+CODEACTIONS = {code: action for action, code in ACTIONCODES.items()}
+# Positions are packed in half tiles, since the ghost home nodes sit half a tile off the grid.
+POSITIONUNIT = TILEWIDTH // 2
+XSLOTS = NCOLS * TILEWIDTH // POSITIONUNIT
+YSLOTS = NROWS * TILEHEIGHT // POSITIONUNIT
+
+# What the learner sees: Pac-Man's position, whether each direction is safe
+# from ghosts and which way the nearest pellet is.
+DEFAULTSCHEMA = StateSchema(
+    [
+        PositionField("playerPosition", POSITIONUNIT, XSLOTS, YSLOTS),
+        FlagField("leftSafe"),
+        FlagField("rightSafe"),
+        FlagField("upSafe"),
+        FlagField("downSafe"),
+        ChoiceField("pelletDirection", [STOP, UP, DOWN, LEFT, RIGHT]),
+    ]
+)
+# Number of distinct state codes, i.e. rows of a dense Q-table.
+NUMSTATES = DEFAULTSCHEMA.size
+# The feature saying whether moving in each direction is safe from ghosts.
+SAFEFEATURES = {LEFT: "leftSafe", RIGHT: "rightSafe", UP: "upSafe", DOWN: "downSafe"}
+
+
+# The values of a schema's fields, also readable as attributes by field name
+# (state.leftSafe, ...). Each field is a feature of the same name (features.py).
 class State:
-    def __init__(self, playerPosition, leftSafe, rightSafe, upSafe, downSafe, pelletDirection) -> None:
-        # TODO: Add more variables in the state so that the agent can account for more things in its environment
-        # examples: (ghosts,)
-        # warning: The more variables you add, the more space it will have search and it will take more time to train
-        self.playerPosition = playerPosition
-        self.leftSafe = leftSafe
-        self.rightSafe =  rightSafe
-        self.upSafe = upSafe
-        self.downSafe = downSafe
-        self.pelletDirection = pelletDirection
+    def __init__(self, *values, schema: StateSchema = DEFAULTSCHEMA) -> None:
+        self.schema = schema
+        self.values = values
+        for name, value in zip(schema.names, values):
+            setattr(self, name, value)
+        self.code: int | None = None
+
+    # Packs the state into an int in [0, schema.size).
+    def encode(self) -> int:
+        if self.code is None:
+            self.code = self.schema.encode(self.values)
+        return self.code
+
+    # Inverse of encode, for inspecting stored Q-values.
+    @staticmethod
+    def decode(code: int, schema: StateSchema = DEFAULTSCHEMA) -> State:
+        return State(*schema.decode(code), schema=schema)
 
     def __str__(self) -> str:
-        return "Pacmn x/y: {}/{} | L:{} | R:{} | U:{} | D:{} | DIR: {}".format(self.playerPosition[0], self.playerPosition[1], self.leftSafe, self.rightSafe, self.upSafe, self.downSafe, self.pelletDirection)
+        return " | ".join(
+            "{}: {}".format(name, value) for name, value in zip(self.schema.names, self.values)
+        )
 
 
 class Action(IntEnum):
@@ -39,18 +81,53 @@ class Action(IntEnum):
     RIGHT = RIGHT
 
     def __str__(self) -> str:
-        return str(self)
+        return self.name
+
+
+# Writes a file through a temporary file and fsync, so a crash mid-write never
+# leaves a truncated file behind. Returns the number of bytes written.
+def writeFileAtomically(filePath: str, write) -> int:
+    tmpPath = filePath + ".tmp"
+    fw = open(tmpPath, "wb")
+    write(fw)
+    fw.flush()
+    os.fsync(fw.fileno())
+    size = fw.tell()
+    fw.close()
+    os.replace(tmpPath, filePath)
+    return size
+
+
+# Renames a saved table that can't be loaded to <file>.old (or .old.1, .old.2
+# and so on if that exists), so starting over with an empty table never
+# overwrites it. Returns the new path.
+def moveAside(filePath: str) -> str:
+    oldPath = filePath + ".old"
+    suffix = 0
+    while os.path.exists(oldPath):
+        suffix += 1
+        oldPath = "{}.old.{}".format(filePath, suffix)
+    os.replace(filePath, oldPath)
+    print("Moved", filePath, "to", oldPath)
+    return oldPath
 
 
-def hash(state: State, action: Action) -> str:
-    return "{}.{}".format(str(state), str(action))
+def hash(state: State, action: Action) -> int:
+    return state.encode() << 2 | ACTIONCODES[action]
+
+
+# Inverse of hash, for inspecting stored Q-values.
+def unhash(key: int, schema: StateSchema = DEFAULTSCHEMA) -> tuple[State, Action]:
+    return State.decode(key >> 2, schema), Action(CODEACTIONS[key & 0x3])
 
 
 class QValueStore:
-    def __init__(self, filePath: str) -> None:
+    # filePath None keeps the table in memory only (e.g. in worker processes).
+    def __init__(self, filePath: str | None) -> None:
         self.filePath = filePath
-        self.storage: dict[str, float] = {}
-        self.load(self.filePath)
+        self.storage: dict[int, float] = {}
+        if self.filePath is not None:
+            self.load(self.filePath)
 
     def getQValue(self, state: State, action: Action) -> float:
         h = hash(state, action)
@@ -67,11 +144,52 @@ class QValueStore:
         h = hash(state, action)
         self.storage[h] = value
 
+    # Same as DenseQValueStore.updateBatch, one transition at a time.
+    def updateBatch(
+        self,
+        states: np.ndarray,
+        actions: np.ndarray,
+        rewards: np.ndarray,
+        nextStates: np.ndarray,
+        dones: np.ndarray,
+        nextActions: np.ndarray,
+        learningRate,
+        discountRate,
+        weights: np.ndarray | None = None,
+    ) -> np.ndarray:
+        keys = (np.asarray(states, dtype=np.int64) << 2 | actions).tolist()
+        targets = []
+        for nextState, done, available, reward in zip(
+            np.asarray(nextStates, dtype=np.int64).tolist(), dones, nextActions, rewards
+        ):
+            maxQ = 0.0
+            if not done and available.any():
+                maxQ = max(self.storage.get(nextState << 2 | int(code), 0.0) for code in np.flatnonzero(available))
+            targets.append(float(reward) + discountRate * maxQ)
+        errors = np.array(
+            [target - self.storage.get(key, 0.0) for key, target in zip(keys, targets)]
+        )
+        for i, (key, target) in enumerate(zip(keys, targets)):
+            step = learningRate if weights is None else learningRate * float(weights[i])
+            q = self.storage.get(key, 0.0)
+            self.storage[key] = q + step * (target - q)
+        return errors
+
     def save(self):
-        print("Saving: dictionary size", len(self.storage))
-        fw = open(self.filePath, "wb")
-        pickle.dump(self.storage, fw)
-        fw.close()
+        if self.filePath is None:
+            return
+        self.writeSnapshot(self.snapshot())
+
+    # Copy of the table that stays valid while training keeps updating the store.
+    def snapshot(self) -> dict[int, float]:
+        return dict(self.storage)
+
+    # Writes a snapshot to disk and returns its size in bytes.
+    def writeSnapshot(self, snapshot: dict[int, float]) -> int:
+        print("Saving: dictionary size", len(snapshot))
+        return writeFileAtomically(
+            self.filePath, lambda fw: pickle.dump(snapshot, fw)
+        )
 
     # Loads a Q-table.
     def load(self, file: str):
@@ -80,19 +198,349 @@ class QValueStore:
             self.storage = pickle.load(fr)
             print("Loading: dictionary size", len(self.storage))
             fr.close()
+            if any(not isinstance(key, int) for key in self.storage):
+                # tables saved before states were packed into ints can't be reused
+                print("Discarding Q-table with old string keys")
+                moveAside(file)
+                self.storage = {}
+        else:
+            self.save()
+
+
+# Q-table backed by a float32 array with one row per state code of the schema
+# and one column per action, for state spaces small enough to enumerate.
+class DenseQValueStore:
+    def __init__(self, filePath: str | None, schema: StateSchema = DEFAULTSCHEMA) -> None:
+        self.filePath = filePath
+        self.schema = schema
+        self.table = np.zeros((schema.size, len(ACTIONCODES)), dtype=np.float32)
+        if self.filePath is not None:
+            self.load(self.filePath)
+
+    def getQValue(self, state: State, action: Action) -> float:
+        return float(self.table[state.encode(), ACTIONCODES[action]])
+
+    def getBestAction(self, state: State, possibleActions: list[Action]) -> Action:
+        columns = [ACTIONCODES[action] for action in possibleActions]
+        values = self.table[state.encode(), columns]
+        return possibleActions[int(np.argmax(values))]
+
+    def storeQValue(self, state: State, action: Action, value: float):
+        self.table[state.encode(), ACTIONCODES[action]] = value
+
+    # Sets table[rows[i], columns[i]] = values[i] for whole arrays of entries.
+    def storeQValues(self, rows: np.ndarray, columns: np.ndarray, values: np.ndarray):
+        self.table[rows, columns] = values
+
+    # Applies the Q-learning update to whole arrays of transitions (state
+    # codes, action codes, rewards, next state codes, done flags and a (n, 4)
+    # mask of the actions available in each next state) at once. Transitions
+    # that are done don't bootstrap; weights scale the learning rate of each
+    # transition. Targets come from the table as it was before the batch, and
+    # a state and action that appears k times gets its k updates applied one
+    # after another in batch order, in k rounds of distinct entries, rather
+    # than keeping just one of them. Returns the TD errors.
+    def updateBatch(
+        self,
+        states: np.ndarray,
+        actions: np.ndarray,
+        rewards: np.ndarray,
+        nextStates: np.ndarray,
+        dones: np.ndarray,
+        nextActions: np.ndarray,
+        learningRate,
+        discountRate,
+        weights: np.ndarray | None = None,
+    ) -> np.ndarray:
+        states = np.asarray(states, dtype=np.int64)
+        actions = np.asarray(actions, dtype=np.int64)
+        nextActions = np.asarray(nextActions, dtype=np.bool_)
+        nextQ = np.where(nextActions, self.table[nextStates], -np.inf).max(axis=1)
+        nextQ[np.asarray(dones, dtype=np.bool_) | ~nextActions.any(axis=1)] = 0.0
+        targets = rewards + discountRate * nextQ
+        errors = targets - self.table[states, actions]
+        steps = learningRate if weights is None else learningRate * np.asarray(weights)
+
+        # rank of each transition among the earlier ones with the same entry
+        flat = states * len(ACTIONCODES) + actions
+        order = np.argsort(flat, kind="stable")
+        sortedFlat = flat[order]
+        firsts = np.flatnonzero(np.r_[True, sortedFlat[1:] != sortedFlat[:-1]])
+        if len(firsts) == len(flat):
+            self.storeQValues(states, actions, self.table[states, actions] + steps * errors)
+            return errors
+        counts = np.diff(np.r_[firsts, len(flat)])
+        ranks = np.empty(len(flat), dtype=np.int64)
+        ranks[order] = np.arange(len(flat)) - np.repeat(firsts, counts)
+        steps = np.broadcast_to(steps, flat.shape)
+        for rank in range(int(counts.max())):
+            chosen = ranks == rank
+            rows, columns = states[chosen], actions[chosen]
+            q = self.table[rows, columns]
+            self.storeQValues(rows, columns, q + steps[chosen] * (targets[chosen] - q))
+        return errors
+
+    def save(self):
+        if self.filePath is None:
+            return
+        self.writeSnapshot(self.snapshot())
+
+    def snapshot(self) -> np.ndarray:
+        return self.table.copy()
+
+    def writeSnapshot(self, snapshot: np.ndarray) -> int:
+        print("Saving: visited states", np.count_nonzero(snapshot.any(axis=1)))
+        return writeFileAtomically(self.filePath, lambda fw: np.save(fw, snapshot))
+
+    # Loads a Q-table.
+    def load(self, file: str):
+        if os.path.exists(file):
+            fr = open(file, "rb")
+            table = np.load(fr)
+            fr.close()
+            if table.shape != self.table.shape:
+                print("Discarding Q-table of shape", table.shape)
+                moveAside(file)
+            else:
+                self.table = table.astype(np.float32, copy=False)
+                print("Loading: visited states", np.count_nonzero(self.table.any(axis=1)))
         else:
             self.save()
 
 
+# Record of the append-only delta log: flat table index and its new value.
+LOGRECORD = np.dtype([("index", "<i8"), ("value", "<f4")])
+
+
+# Dense Q-table persisted as a .npy base file plus an append-only log of changed
+# entries. Training reads and writes an ordinary in-RAM copy of the table (as
+# DenseQValueStore does); only the base file on disk is memory-mapped, to read
+# it on load and to patch it in place when compacting. save() only appends the
+# entries changed since the last checkpoint; once the log grows past
+# compactRecords a background thread folds it into the base file. Loading
+# replays the log on top of the base file.
+class MappedQValueStore(DenseQValueStore):
+    def __init__(
+        self,
+        filePath: str,
+        schema: StateSchema = DEFAULTSCHEMA,
+        compactRecords: int = 100000,
+    ) -> None:
+        self.logPath = filePath + ".log"
+        self.compactingLogPath = filePath + ".log.compacting"
+        self.compactRecords = compactRecords
+        self.logRecords = 0
+        self.dirty: dict[int, float] = {}
+        self.lock = threading.Lock()
+        # signalled whenever a snapshot reaches the log
+        self.written = threading.Condition(self.lock)
+        self.unwritten = 0
+        self.compactor: threading.Thread | None = None
+        DenseQValueStore.__init__(self, filePath, schema)
+
+    def storeQValue(self, state: State, action: Action, value: float):
+        row = state.encode()
+        column = ACTIONCODES[action]
+        self.table[row, column] = value
+        self.dirty[row * len(ACTIONCODES) + column] = value
+
+    def storeQValues(self, rows: np.ndarray, columns: np.ndarray, values: np.ndarray):
+        self.table[rows, columns] = values
+        indices = np.asarray(rows, dtype=np.int64) * len(ACTIONCODES) + columns
+        self.dirty.update(zip(indices.tolist(), np.asarray(values, dtype=np.float32).tolist()))
+
+    # Appends the entries changed since the last checkpoint to the log, after
+    # any checkpoint still being written: later records win on load, so an
+    # older snapshot must never be appended after a newer one.
+    def save(self):
+        if self.dirty:
+            with self.lock:
+                while self.unwritten:
+                    self.written.wait()
+            self.writeSnapshot(self.snapshot())
+
+    # The entries changed since the last checkpoint, as log records.
+    def snapshot(self) -> np.ndarray:
+        records = np.empty(len(self.dirty), dtype=LOGRECORD)
+        records["index"] = list(self.dirty.keys())
+        records["value"] = list(self.dirty.values())
+        self.dirty = {}
+        with self.lock:
+            self.unwritten += 1
+        return records
+
+    # The log, its record count and the start of a compaction are only touched
+    # under the lock, since checkpoints are written on CheckpointWriter's
+    # thread while close() saves on the caller's.
+    def writeSnapshot(self, snapshot: np.ndarray) -> int:
+        with self.lock:
+            try:
+                fw = open(self.logPath, "ab")
+                fw.write(snapshot.tobytes())
+                fw.flush()
+                os.fsync(fw.fileno())
+                fw.close()
+            finally:
+                self.unwritten -= 1
+                self.written.notify_all()
+            self.logRecords += len(snapshot)
+            if self.logRecords >= self.compactRecords:
+                self.startCompaction()
+        return snapshot.nbytes
+
+    # Folds the current log into the base file on a background thread.
+    def compact(self):
+        with self.lock:
+            self.startCompaction()
+
+    # compact() for callers already holding the lock.
+    def startCompaction(self):
+        if self.compactor is not None and self.compactor.is_alive():
+            return
+        if not os.path.exists(self.logPath):
+            return
+        os.replace(self.logPath, self.compactingLogPath)
+        self.logRecords = 0
+        self.compactor = threading.Thread(
+            target=self.applyLog, args=(self.compactingLogPath,)
+        )
+        self.compactor.start()
+
+    # Waits for a running compaction, e.g. before the process exits.
+    def close(self):
+        self.save()
+        if self.compactor is not None:
+            self.compactor.join()
+
+    def readLog(self, logPath: str) -> np.ndarray:
+        fr = open(logPath, "rb")
+        data = fr.read()
+        fr.close()
+        # a crash during an append can leave a partial record at the end
+        usable = len(data) - len(data) % LOGRECORD.itemsize
+        return np.frombuffer(data[:usable], dtype=LOGRECORD)
+
+    def applyRecords(self, table: np.ndarray, records: np.ndarray):
+        # later records win over earlier ones for the same index
+        indices, last = np.unique(records["index"][::-1], return_index=True)
+        table.reshape(-1)[indices] = records["value"][::-1][last]
+
+    def applyLog(self, logPath: str):
+        base = np.lib.format.open_memmap(self.filePath, mode="r+")
+        self.applyRecords(base, self.readLog(logPath))
+        base.flush()
+        del base
+        os.remove(logPath)
+
+    # Loads the base file and replays the log on top of it.
+    def load(self, file: str):
+        if os.path.exists(file):
+            base = np.lib.format.open_memmap(file, mode="r")
+            shape = base.shape
+            del base
+            if shape != self.table.shape:
+                print("Discarding Q-table of shape", shape)
+                # its logs index into the old shape, so they go with it
+                for path in [file, self.logPath, self.compactingLogPath]:
+                    if os.path.exists(path):
+                        moveAside(path)
+        if not os.path.exists(file):
+            base = np.lib.format.open_memmap(
+                file, mode="w+", dtype=np.float32, shape=self.table.shape
+            )
+            base.flush()
+            del base
+        if os.path.exists(self.compactingLogPath):
+            # a compaction was interrupted; finish it before reading the base
+            self.applyLog(self.compactingLogPath)
+        base = np.lib.format.open_memmap(file, mode="r")
+        self.table = np.array(base, dtype=np.float32)
+        del base
+        if os.path.exists(self.logPath):
+            records = self.readLog(self.logPath)
+            self.applyRecords(self.table, records)
+            self.logRecords = len(records)
+        print("Loading: visited states", np.count_nonzero(self.table.any(axis=1)))
+
+
+# Takes checkpoints of a Q-value store without stalling training: the table is
+# snapshotted in the calling thread and serialized/fsynced on a background one.
+class CheckpointWriter:
+    def __init__(self, store: QValueStore | DenseQValueStore) -> None:
+        self.store = store
+        self.writer: threading.Thread | None = None
+        self.lastSnapshotTime = 0.0
+        self.lastWriteTime = 0.0
+        self.lastSize = 0
+
+    # Starts a checkpoint; skipped while the previous one is still being written.
+    def checkpoint(self) -> bool:
+        if self.store.filePath is None:
+            return False
+        if self.writer is not None and self.writer.is_alive():
+            print("Checkpoint skipped: previous checkpoint still writing")
+            return False
+        start = time.perf_counter()
+        snapshot = self.store.snapshot()
+        self.lastSnapshotTime = time.perf_counter() - start
+        self.writer = threading.Thread(target=self.write, args=(snapshot,))
+        self.writer.start()
+        return True
+
+    def write(self, snapshot):
+        start = time.perf_counter()
+        self.lastSize = self.store.writeSnapshot(snapshot)
+        self.lastWriteTime = time.perf_counter() - start
+        print(
+            "Checkpoint: {} bytes, snapshot {:.2f} ms, write {:.2f} ms".format(
+                self.lastSize, self.lastSnapshotTime * 1000, self.lastWriteTime * 1000
+            )
+        )
+
+    # Blocks until the checkpoint in progress (if any) is on disk.
+    def wait(self):
+        if self.writer is not None:
+            self.writer.join()
+
+    # Writes the entries changed since the last checkpoint and closes the
+    # store. The checkpoint in progress goes first: its snapshot is older, and
+    # whichever is written last wins when the store is loaded again.
+    def close(self):
+        self.wait()
+        if isinstance(self.store, MappedQValueStore):
+            self.store.close()
+        else:
+            self.store.save()
+
+
 class ReinforcementProblem:
-    def __init__(self) -> None:
-        self.game = GameController()
+    # actionFrames: number of fixed-dt ticks each action is simulated for,
+    # or None to keep simulating until Pac-Man reaches the next node.
+    # seed: seeds the random module so that headless runs are reproducible.
+    # schema: which features make up the states; only those are computed.
+    # verbose: print every state an action is taken in.
+    def __init__(
+        self,
+        headless: bool = False,
+        dt: float = 1.0 / 30,
+        actionFrames: int | None = 3,
+        seed: int | None = None,
+        schema: StateSchema = DEFAULTSCHEMA,
+        verbose: bool = True,
+    ) -> None:
+        if seed is not None:
+            random.seed(seed)
+        self.actionFrames = actionFrames
+        self.schema = schema
+        self.verbose = verbose
+        self.game = GameController(headless=headless, dt=dt)
+        self.features = FeatureCache(self.game)
         self.game.restartGameRandom()
 
     def getCurrentState(self) -> State:
-        return State(self.game.pacmanPosition(), self.game.leftSafe(),
-                     self.game.rightSafe(), self.game.upSafe(),
-                     self.game.downSafe(), self.game.getPelletDirection())
+        return State(
+            *[self.features.get(name) for name in self.schema.names], schema=self.schema
+        )
 
     # Choose a random starting state for the problem.
     def getRandomState(self) -> State:
@@ -100,16 +548,13 @@ class ReinforcementProblem:
         return self.getCurrentState()
 
     # Get the available actions for the given state.
+    # The state is always the current one, so the safety flags are read from
+    # the feature cache and the schema does not have to include them.
     def getAvailableActions(self, state: State) -> list[Action]:
-        directions = self.game.pacman.validDirections()
-        if self.game.pacman.direction == LEFT and not state.leftSafe:
-            directions.append(self.game.pacman.direction*-1)
-        elif self.game.pacman.direction == RIGHT and not state.rightSafe:
-            directions.append(self.game.pacman.direction*-1)
-        elif self.game.pacman.direction == UP and not state.upSafe:
-            directions.append(self.game.pacman.direction*-1)
-        elif self.game.pacman.direction == DOWN and not state.downSafe:
-            directions.append(self.game.pacman.direction*-1)
+        directions = list(self.features.get("validDirections"))
+        direction = self.game.pacman.direction
+        if direction in SAFEFEATURES and not self.features.get(SAFEFEATURES[direction]):
+            directions.append(direction*-1)
         def intDirectionToString(dir: Action) -> str:
             match dir:
                 case Action.UP:
@@ -130,6 +575,24 @@ class ReinforcementProblem:
         for i in range(frames):
             self.game.update()
 
+    # Advances the game until Pac-Man arrives at a node other than the one it
+    # started from, capped at maxFrames. Returns the number of frames simulated.
+    def updateGameUntilNextNode(self, maxFrames: int = 60) -> int:
+        startNode = self.game.pacman.node
+        frames = 0
+        while frames < maxFrames:
+            self.game.update()
+            frames += 1
+            if self.game.pacman.node is not startNode:
+                break
+        return frames
+
+    def stepAction(self) -> int:
+        if self.actionFrames is None:
+            return self.updateGameUntilNextNode()
+        self.updateGameNTimes(self.actionFrames)
+        return self.actionFrames
+
     def updateGameForSeconds(self, seconds: float):
         durationMills: float = seconds * 1000
         currentTime = pygame.time.get_ticks()
@@ -141,9 +604,13 @@ class ReinforcementProblem:
     # Take the given action and state, and return
     # a pair consisting of the reward and the new state.
     def takeAction(self, state: State, action: Action) -> tuple[float, State]:
-        print('takeAction:', state)
+        if self.verbose:
+            print('takeAction:', state)
         # previousScore = self.game.score
-        previousPelletCount = self.game.pellets.pelletList.__len__()
+        previousPelletCount = len(self.game.pellets)
+        # Read before stepping: the feature cache moves on with the game's tick.
+        pelletDirection = self.features.get("pelletDirection")
+        actionSafe = action not in SAFEFEATURES or self.features.get(SAFEFEATURES[action])
         # self.game.pacman.direction = action
         self.game.pacman.learntDirection = action
         # if self.game.pacman.node.neighbors[action] is not None:
@@ -152,23 +619,16 @@ class ReinforcementProblem:
         #     self.game.pacman.node = self.game.pacman.lastNode
         #     self.game.pacman.target = self.game.pacman.lastNode.neighbors[action]
         # TODO: Adjust the reward function to make it learn better
-        problem.updateGameForSeconds(0.1)
+        self.stepAction()
         # problem.updateGameNTimes(1)
-        pelletCount = self.game.pellets.pelletList.__len__()
+        pelletCount = len(self.game.pellets)
         reward = 0
         if pelletCount<previousPelletCount:
             reward += 5
-        if action == state.pelletDirection:
+        if action == pelletDirection:
             reward +=10
 
-  
-        if action == LEFT and state.leftSafe == False:
-            reward -=  20  
-        elif action == RIGHT and state.rightSafe == False:
-            reward -= 20
-        elif action == UP and state.upSafe==False:
-            reward -= 20 
-        elif action == DOWN and state.downSafe==False:
+        if not actionSafe:
             reward -= 20
         # print('reward:', reward)
         # reward = self.game.score - previousScore
@@ -189,6 +649,87 @@ class ReinforcementProblem:
     # number of iterations that will be carried out in a sequence of connected actions.
 
 
+# Holds several independent headless games and steps them as one batch,
+# so a single learner can collect experience from all of them per iteration.
+class VectorizedProblem:
+    def __init__(
+        self,
+        numEnvs: int,
+        dt: float = 1.0 / 30,
+        actionFrames: int | None = 3,
+        seed: int | None = None,
+        schema: StateSchema = DEFAULTSCHEMA,
+    ) -> None:
+        if seed is not None:
+            random.seed(seed)
+        self.problems = [
+            ReinforcementProblem(
+                headless=True, dt=dt, actionFrames=actionFrames, schema=schema
+            )
+            for _ in range(numEnvs)
+        ]
+        self.states: list[State] = []
+
+    def __len__(self) -> int:
+        return len(self.problems)
+
+    # Runs a paused game (death, level change) until it resumes.
+    def skipPause(self, problem: ReinforcementProblem):
+        while problem.game.pause.paused:
+            problem.updateGameNTimes(1)
+
+    # Restarts every game and returns the batch of starting states.
+    def reset(self) -> list[State]:
+        self.states = []
+        for problem in self.problems:
+            problem.game.restartGameRandom()
+            self.skipPause(problem)
+            self.states.append(problem.getCurrentState())
+        return list(self.states)
+
+    def getAvailableActions(self, states: list[State]) -> list[list[Action]]:
+        return [
+            problem.getAvailableActions(state)
+            for problem, state in zip(self.problems, states)
+        ]
+
+    # Takes one action in every game and returns the batch of new states and rewards.
+    def step(self, actions: list[Action]) -> tuple[list[State], list[float]]:
+        rewards = []
+        for i, (problem, action) in enumerate(zip(self.problems, actions)):
+            reward, newState = problem.takeAction(self.states[i], action)
+            if problem.game.pause.paused:
+                self.skipPause(problem)
+                newState = problem.getCurrentState()
+            self.states[i] = newState
+            rewards.append(reward)
+        return list(self.states), rewards
+
+
+# Applies one Q-learning update for the transition (state, action) -> newState.
+def updateQValue(
+    store: QValueStore | DenseQValueStore,
+    state: State,
+    action: Action,
+    reward: float,
+    newState: State,
+    newActions: list[Action],
+    learningRate,
+    discountRate,
+):
+    # Get the current q from the store.
+    q = store.getQValue(state, action)
+
+    # Get the q of the best action from the new state
+    maxQ = store.getQValue(newState, store.getBestAction(newState, newActions))
+
+    # Perform the q learning.
+    q = (1 - learningRate) * q + learningRate * (reward + discountRate * maxQ)
+
+    # Store the new Q-value.
+    store.storeQValue(state, action, q)
+
+
 # Updates the store by investigating the problem.
 def QLearning(
     problem: ReinforcementProblem,
@@ -197,6 +738,7 @@ def QLearning(
     discountRate,
     explorationRandomness,
     walkLength,
+    checkpointWriter: CheckpointWriter | None = None,
 ):
     # Get a starting state.
     state = problem.getRandomState()
@@ -207,12 +749,16 @@ def QLearning(
         print('--------------------', i)
         if problem.game.pause.paused:
             # print("game is paused. Waiting..")
-            time.sleep(1)
+            if not problem.game.headless:
+                time.sleep(1)
             problem.updateGameNTimes(1)
             continue
         if i % saveIterations == 0:
             print("Saving at iteration:", i)
-            store.save()
+            if checkpointWriter is not None:
+                checkpointWriter.checkpoint()
+            else:
+                store.save()
         # Pick a new state every once in a while.
         if random.uniform(0, 1) < walkLength:
             state = problem.getRandomState()
@@ -233,22 +779,129 @@ def QLearning(
         reward, newState = problem.takeAction(state, action)
         # problem.updateGameNTimes(1)
 
-        # Get the current q from the store.
-        q = store.getQValue(state, action)
-
-        # Get the q of the best action from the new state
-        maxQ = store.getQValue(
+        updateQValue(
+            store,
+            state,
+            action,
+            reward,
             newState,
-            store.getBestAction(newState, problem.getAvailableActions(newState)),
+            problem.getAvailableActions(newState),
+            learningRate,
+            discountRate,
         )
 
-        # Perform the q learning.
-        q = (1 - learningRate) * q + learningRate * (reward + discountRate * maxQ)
+        # And update the state.
+        state = newState
+        i += 1
 
-        # Store the new Q-value.
-        store.storeQValue(state, action, q)
 
-        # And update the state.
+# Same update rule as QLearning, but every iteration consumes one transition
+# from each game of a VectorizedProblem.
+def VectorizedQLearning(
+    problem: VectorizedProblem,
+    store: QValueStore | DenseQValueStore,
+    iterations,
+    learningRate,
+    discountRate,
+    explorationRandomness,
+    checkpointWriter: CheckpointWriter | None = None,
+):
+    states = problem.reset()
+    saveIterations = 50
+    for i in range(iterations):
+        if i % saveIterations == 0:
+            print("Saving at iteration:", i)
+            if checkpointWriter is not None:
+                checkpointWriter.checkpoint()
+            else:
+                store.save()
+
+        availableActions = problem.getAvailableActions(states)
+        actions = []
+        for state, possibleActions in zip(states, availableActions):
+            if random.uniform(0, 1) < explorationRandomness:
+                actions.append(random.choice(possibleActions))
+            else:
+                actions.append(store.getBestAction(state, possibleActions))
+
+        newStates, rewards = problem.step(actions)
+        newAvailableActions = problem.getAvailableActions(newStates)
+
+        for state, action, reward, newState, newActions in zip(
+            states, actions, rewards, newStates, newAvailableActions
+        ):
+            updateQValue(
+                store,
+                state,
+                action,
+                reward,
+                newState,
+                newActions,
+                learningRate,
+                discountRate,
+            )
+
+        states = newStates
+
+# QLearning with experience replay: every transition is applied once as it
+# happens, kept in the buffer, and each iteration also replays batchSize
+# stored transitions, so one simulated step feeds many updates.
+# prioritized: sample by TD error (see ReplayBuffer.samplePrioritized).
+def ReplayQLearning(
+    problem: ReinforcementProblem,
+    store: QValueStore | DenseQValueStore,
+    buffer: ReplayBuffer,
+    iterations,
+    learningRate,
+    discountRate,
+    explorationRandomness,
+    batchSize: int = 32,
+    prioritized: bool = False,
+    checkpointWriter: CheckpointWriter | None = None,
+):
+    state = problem.getRandomState()
+    saveIterations = 50
+    i = 0
+    while i < iterations:
+        if problem.game.pause.paused:
+            problem.updateGameNTimes(1)
+            continue
+        if i % saveIterations == 0:
+            if checkpointWriter is not None:
+                checkpointWriter.checkpoint()
+            else:
+                store.save()
+
+        actions = problem.getAvailableActions(state)
+        if random.uniform(0, 1) < explorationRandomness:
+            action = random.choice(actions)
+        else:
+            action = store.getBestAction(state, actions)
+
+        reward, newState = problem.takeAction(state, action)
+        newActions = problem.getAvailableActions(newState)
+        updateQValue(
+            store, state, action, reward, newState, newActions, learningRate, discountRate
+        )
+        done = not problem.game.pacman.alive or problem.game.pellets.isEmpty()
+        buffer.add(
+            state.encode(),
+            ACTIONCODES[action],
+            reward,
+            newState.encode(),
+            done,
+            [ACTIONCODES[newAction] for newAction in newActions],
+        )
+
+        if len(buffer) >= batchSize:
+            if prioritized:
+                indices, batch, weights = buffer.samplePrioritized(batchSize)
+                errors = store.updateBatch(*batch, learningRate, discountRate, weights)
+                buffer.updatePriorities(indices, errors)
+            else:
+                indices, batch = buffer.sampleUniform(batchSize)
+                store.updateBatch(*batch, learningRate, discountRate)
+
         state = newState
         i += 1
 
@@ -258,5 +911,7 @@ if __name__ == "__main__":
     # the learning.
     store = QValueStore("training")
     problem = ReinforcementProblem()
+    checkpointWriter = CheckpointWriter(store)
 
-    QLearning(problem, 100000, 0.7, 0.75, 0.9, 0)
+    QLearning(problem, 100000, 0.7, 0.75, 0.9, 0, checkpointWriter)
+    checkpointWriter.close()
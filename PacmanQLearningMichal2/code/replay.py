@@ -0,0 +1,115 @@
+from __future__ import annotations
+
+import numpy as np
+
+NUMACTIONS = 4
+
+
+# Fixed-size memory of past transitions (state code, action code, reward, next
+# state code, done, and which actions were available in the next state), kept
+# in preallocated arrays used as a ring: once full, new transitions overwrite
+# the oldest. Transitions can be sampled uniformly or in proportion to their
+# priority (e.g. their last TD error), as in prioritized experience replay.
+# alpha: how strongly priorities skew sampling (0 is uniform).
+class ReplayBuffer(object):
+    def __init__(self, capacity: int, seed: int | None = None, alpha: float = 0.6) -> None:
+        self.capacity = capacity
+        self.alpha = alpha
+        self.states = np.zeros(capacity, dtype=np.int64)
+        self.actions = np.zeros(capacity, dtype=np.int8)
+        self.rewards = np.zeros(capacity, dtype=np.float32)
+        self.nextStates = np.zeros(capacity, dtype=np.int64)
+        self.dones = np.zeros(capacity, dtype=np.bool_)
+        self.nextActions = np.zeros((capacity, NUMACTIONS), dtype=np.bool_)
+        # sum tree over priority^alpha: node n's children are 2n and 2n + 1,
+        # the root is node 1 and transition i is leaf self.leaves + i
+        self.depth = max(capacity - 1, 1).bit_length()
+        self.leaves = 1 << self.depth
+        self.tree = np.zeros(2 * self.leaves, dtype=np.float64)
+        self.maxPriority = 1.0
+        self.position = 0
+        self.count = 0
+        self.rng = np.random.default_rng(seed)
+
+    def __len__(self) -> int:
+        return self.count
+
+    # nextActions: codes of the actions available in the next state.
+    # New transitions get the highest priority seen so far, so each one is
+    # likely to be replayed at least once.
+    def add(self, state, action, reward, nextState, done, nextActions):
+        i = self.position
+        self.states[i] = state
+        self.actions[i] = action
+        self.rewards[i] = reward
+        self.nextStates[i] = nextState
+        self.dones[i] = done
+        self.nextActions[i] = False
+        self.nextActions[i, nextActions] = True
+        self.setScaledAt(i, self.maxPriority ** self.alpha)
+        self.position = (i + 1) % self.capacity
+        self.count = min(self.count + 1, self.capacity)
+
+    def getBatch(self, indices: np.ndarray) -> tuple[np.ndarray, ...]:
+        return (
+            self.states[indices],
+            self.actions[indices],
+            self.rewards[indices],
+            self.nextStates[indices],
+            self.dones[indices],
+            self.nextActions[indices],
+        )
+
+    # Returns the indices of the sampled transitions and the transitions.
+    def sampleUniform(self, batchSize: int) -> tuple[np.ndarray, tuple[np.ndarray, ...]]:
+        indices = self.rng.integers(0, self.count, size=batchSize)
+        return indices, self.getBatch(indices)
+
+    # setScaled() for a single transition.
+    def setScaledAt(self, i: int, scaled: float):
+        tree = self.tree
+        node = i + self.leaves
+        tree[node] = scaled
+        while node > 1:
+            node >>= 1
+            tree[node] = tree[2 * node] + tree[2 * node + 1]
+
+    # Stores the scaled priorities of transitions indices (the last one wins
+    # for an index given twice) and redoes the sums above them, a level at a
+    # time. Nodes shared by several indices just get the same sum again.
+    def setScaled(self, indices: np.ndarray, scaled: np.ndarray):
+        tree = self.tree
+        nodes = indices + self.leaves
+        tree[nodes] = scaled
+        for _ in range(self.depth):
+            nodes //= 2
+            tree[nodes] = tree[2 * nodes] + tree[2 * nodes + 1]
+
+    # Samples transition i with probability priority_i^alpha / sum, walking
+    # the sum tree down from the root for the whole batch at once. Also
+    # returns importance-sampling weights (count * P(i))^-beta, scaled so the
+    # largest is 1, to correct for the bias towards high-priority transitions.
+    def samplePrioritized(
+        self, batchSize: int, beta: float = 0.4
+    ) -> tuple[np.ndarray, tuple[np.ndarray, ...], np.ndarray]:
+        tree = self.tree
+        total = tree[1]
+        values = self.rng.random(batchSize) * total
+        nodes = np.ones(batchSize, dtype=np.int64)
+        for _ in range(self.depth):
+            nodes *= 2
+            left = tree[nodes]
+            right = values >= left
+            values -= left * right
+            nodes += right
+        # rounding can step past the last transition into the empty leaves
+        indices = np.minimum(nodes - self.leaves, self.count - 1)
+        probabilities = tree[indices + self.leaves] / total
+        weights = (self.count * probabilities) ** -beta
+        weights /= weights.max()
+        return indices, self.getBatch(indices), weights
+
+    def updatePriorities(self, indices: np.ndarray, priorities: np.ndarray, epsilon: float = 1e-3):
+        priorities = np.abs(priorities) + epsilon
+        self.setScaled(np.asarray(indices), priorities ** self.alpha)
+        self.maxPriority = max(self.maxPriority, float(priorities.max()))
@@ -19,31 +19,46 @@ from constants import (
     SPAWN,
     WHITE,
 )
+from collisions import CollisionGrid
 from pacman import Pacman
 from nodes import NodeGroup
 from pellets import PelletGroup
+from pelletfield import PelletDistanceField
+from dangerfield import GhostDangerField
 from ghosts import GhostGroup
 from fruit import Fruit
 from pauser import Pause
+from scheduler import Scheduler
 from text import TextGroup
 from sprites import LifeSprites
 from sprites import MazeSprites
 from mazedata import MazeData
+from mazecache import loadCompiledMaze
 from constants import *
 from random import choice
-from algorithms import dijkstra_or_a_star
 
 class GameController(object):
-    def __init__(self):
+    # headless: no window, no rendering and no event pumping; every update()
+    # advances the simulation by a fixed dt instead of waiting on the clock
+    def __init__(self, headless=False, dt=1.0 / 30):
         pygame.init()
-        self.screen = pygame.display.set_mode(SCREENSIZE, 0, 32)
+        self.headless = headless
+        self.dt = dt
+        if not self.headless:
+            self.screen = pygame.display.set_mode(SCREENSIZE, 0, 32)
         self.clock = pygame.time.Clock()
+        # timers run out at the end of every frame; playTimers (ghost modes,
+        # the fruit) only count the frames that aren't paused. Headless they
+        # count frames of dt; in the window, the time the frames really took.
+        self.timers = Scheduler(dt if headless else None)
+        self.playTimers = Scheduler(dt if headless else None)
         self.fruit = None
-        self.pause = Pause(False)
+        self.pellets = None
+        self.pause = Pause(self.timers, False)
         self.level = 0
         self.lives = 5
         self.score = 0
-        self.textgroup = TextGroup()
+        self.textgroup = TextGroup(self.timers)
         self.lifesprites = LifeSprites(self.lives)
         self.flashBG = False
         self.flashTime = 0.2
@@ -51,6 +66,11 @@ class GameController(object):
         self.fruitCaptured = []
         self.fruitNode = None
         self.mazedata = MazeData()  ######
+        # bumped whenever the simulation state changes (every update, start,
+        # restore or Pac-Man respawn), so derived values can be cached per tick
+        self.tick = 0
+        # tick the danger field was last brought up to date at
+        self.dangerTick = -1
 
     def setBackground(self):
         self.background_norm = pygame.surface.Surface(SCREENSIZE).convert()
@@ -67,20 +87,30 @@ class GameController(object):
         self.background = self.background_norm
 
     def startGame(self):
+        self.tick += 1
+        self.dropMazeTimers()
         self.mazedata.loadMaze(self.level)
         assert self.mazedata.obj is not None
-        self.mazesprites = MazeSprites(
-            self.mazedata.obj.name + ".txt", self.mazedata.obj.name + "_rotation.txt"
-        )
-        self.setBackground()
-        self.nodes = NodeGroup(self.mazedata.obj.name + ".txt")
-        self.mazedata.obj.setPortalPairs(self.nodes)
-        self.mazedata.obj.connectHomeNodes(self.nodes)
+        self.compiledmaze = loadCompiledMaze(self.mazedata.obj)
+        if not self.headless:
+            self.mazesprites = MazeSprites(
+                self.mazedata.obj.name + ".txt",
+                self.mazedata.obj.name + "_rotation.txt",
+                self.compiledmaze,
+            )
+            self.setBackground()
+        # portals and home nodes come already wired from the compiled maze
+        self.nodes = NodeGroup(self.mazedata.obj.name + ".txt", compiled=self.compiledmaze)
+        self.dangerfield = GhostDangerField(self.nodes)
         self.pacman = Pacman(
             self.nodes.getNodeFromTiles(*self.mazedata.obj.pacmanStart)
         )
-        self.pellets = PelletGroup(self.mazedata.obj.name + ".txt")
-        self.ghosts = GhostGroup(self.nodes.getStartTempNode(), self.pacman)
+        self.pellets = PelletGroup(self.mazedata.obj.name + ".txt", self.timers, self.compiledmaze)
+        self.pelletfield = PelletDistanceField(self.nodes, self.pellets)
+        self.ghosts = GhostGroup(self.nodes.getStartTempNode(), self.pacman, self.playTimers)
+        self.collisions = CollisionGrid()
+        for ghost in self.ghosts:
+            ghost.joinGrid(self.collisions)
 
         self.ghosts.pinky.setStartNode(
             self.nodes.getNodeFromTiles(*self.mazedata.obj.addOffset(2, 3))
@@ -105,19 +135,29 @@ class GameController(object):
         self.mazedata.obj.denyGhostsAccess(self.ghosts, self.nodes)
 
     def startGameRandom(self):
+        self.tick += 1
+        self.dropMazeTimers()
         self.mazedata.loadMaze(self.level)
         assert self.mazedata.obj is not None
-        self.mazesprites = MazeSprites(
-            self.mazedata.obj.name + ".txt", self.mazedata.obj.name + "_rotation.txt"
-        )
-        self.setBackground()
-        self.nodes = NodeGroup(self.mazedata.obj.name + ".txt")
-        self.mazedata.obj.setPortalPairs(self.nodes)
-        self.mazedata.obj.connectHomeNodes(self.nodes)
+        self.compiledmaze = loadCompiledMaze(self.mazedata.obj)
+        if not self.headless:
+            self.mazesprites = MazeSprites(
+                self.mazedata.obj.name + ".txt",
+                self.mazedata.obj.name + "_rotation.txt",
+                self.compiledmaze,
+            )
+            self.setBackground()
+        # portals and home nodes come already wired from the compiled maze
+        self.nodes = NodeGroup(self.mazedata.obj.name + ".txt", compiled=self.compiledmaze)
+        self.dangerfield = GhostDangerField(self.nodes)
 
         self.setPacmanInRandomPosition()
-        self.pellets = PelletGroup(self.mazedata.obj.name + ".txt")
-        self.ghosts = GhostGroup(self.nodes.getStartTempNode(), self.pacman)
+        self.pellets = PelletGroup(self.mazedata.obj.name + ".txt", self.timers, self.compiledmaze)
+        self.pelletfield = PelletDistanceField(self.nodes, self.pellets)
+        self.ghosts = GhostGroup(self.nodes.getStartTempNode(), self.pacman, self.playTimers)
+        self.collisions = CollisionGrid()
+        for ghost in self.ghosts:
+            ghost.joinGrid(self.collisions)
 
         self.ghosts.pinky.setStartNode(
             self.nodes.getNodeFromTiles(*self.mazedata.obj.addOffset(2, 3))
@@ -141,17 +181,21 @@ class GameController(object):
         self.ghosts.clyde.startNode.denyAccess(LEFT, self.ghosts.clyde)
         self.mazedata.obj.denyGhostsAccess(self.ghosts, self.nodes)
 
-    def update(self):
+    def update(self, dt=None):
         TIMESCALE = 2.0
 
-        dt = self.clock.tick(30) / 1000.0
+        if self.headless:
+            if dt is None:
+                dt = self.dt
+        else:
+            dt = self.clock.tick(30) / 1000.0
         # dt = self.clock.tick(60) / 1000.0 * TIMESCALE
-        self.textgroup.update(dt)
-        self.pellets.update(dt)
+        self.tick += 1
         if not self.pause.paused:
+            # sprites show the modes from before this frame's timers run out
+            self.ghosts.updateSprites(dt)
+            self.playTimers.update(dt)
             self.ghosts.update(dt)
-            if self.fruit is not None:
-                self.fruit.update(dt)
             self.checkPelletEvents()
             self.checkGhostEvents()
             self.checkFruitEvents()
@@ -162,7 +206,7 @@ class GameController(object):
         else:
             self.pacman.update(dt)
 
-        if self.flashBG:
+        if self.flashBG and not self.headless:
             self.flashTimer += dt
             if self.flashTimer >= self.flashTime:
                 self.flashTimer = 0
@@ -171,11 +215,10 @@ class GameController(object):
                 else:
                     self.background = self.background_norm
 
-        afterPauseMethod = self.pause.update(dt)
-        if afterPauseMethod is not None:
-            afterPauseMethod()
-        self.checkEvents()
-        self.render()
+        self.timers.update(dt)
+        if not self.headless:
+            self.checkEvents()
+            self.render()
 
     def checkEvents(self):
         for event in pygame.event.get():
@@ -193,7 +236,7 @@ class GameController(object):
                             # self.hideEntities()
 
     def checkPelletEvents(self):
-        pellet = self.pacman.eatPellets(self.pellets.pelletList)
+        pellet = self.pacman.eatPellets(self.pellets.getPelletsNear(self.pacman.position))
         if pellet:
             self.pellets.numEaten += 1
             self.updateScore(pellet.points)
@@ -201,7 +244,8 @@ class GameController(object):
                 self.ghosts.inky.startNode.allowAccess(RIGHT, self.ghosts.inky)
             if self.pellets.numEaten == 70:
                 self.ghosts.clyde.startNode.allowAccess(LEFT, self.ghosts.clyde)
-            self.pellets.pelletList.remove(pellet)
+            self.pellets.removePellet(pellet)
+            self.pelletfield.removePellet(pellet)
             if pellet.name == POWERPELLET:
                 self.ghosts.startFreight()
             if self.pellets.isEmpty():
@@ -209,9 +253,13 @@ class GameController(object):
                 self.hideEntities()
                 self.pause.setPause(pauseTime=3, func=self.nextLevel)
 
+    # Only ghosts the collision grid has near Pac-Man can touch him.
     def checkGhostEvents(self):
+        near = self.collisions.near(self.pacman)
+        if not near:
+            return
         for ghost in self.ghosts:
-            if self.pacman.collideGhost(ghost):
+            if ghost in near and self.pacman.collideGhost(ghost):
                 if ghost.mode.current is FREIGHT:
                     self.pacman.visible = False
                     ghost.visible = False
@@ -245,10 +293,11 @@ class GameController(object):
     def checkFruitEvents(self):
         if self.pellets.numEaten == 50 or self.pellets.numEaten == 140:
             if self.fruit is None:
-                self.fruit = Fruit(self.nodes.getNodeFromTiles(9, 20), self.level)
+                self.fruit = Fruit(self.nodes.getNodeFromTiles(9, 20), self.playTimers, self.level)
+                self.fruit.joinGrid(self.collisions)
                 print(self.fruit)
         if self.fruit is not None:
-            if self.pacman.collideCheck(self.fruit):
+            if self.fruit in self.collisions.near(self.pacman) and self.pacman.collideCheck(self.fruit):
                 self.updateScore(self.fruit.points)
                 self.textgroup.addText(
                     str(self.fruit.points),
@@ -265,9 +314,13 @@ class GameController(object):
                         break
                 if not fruitCaptured:
                     self.fruitCaptured.append(self.fruit.image)
-                self.fruit = None
+                self.removeFruit()
             elif self.fruit.destroy:
-                self.fruit = None
+                self.removeFruit()
+
+    def removeFruit(self):
+        self.collisions.remove(self.fruit)
+        self.fruit = None
 
     def showEntities(self):
         self.pacman.visible = True
@@ -312,15 +365,114 @@ class GameController(object):
         self.fruitCaptured = []
 
     def setPacmanInRandomPosition(self):
+        self.tick += 1
         homeNode: Node = self.nodes.getNodeFromTiles(*self.mazedata.obj.addOffset(2, 3))
 
         self.pacman = Pacman(self.nodes.getRandomNodeAwayFrom(homeNode.position, 60.0))  # type: ignore
 
+    # The ghosts, fruit and pellets of the maze being replaced take their
+    # pending timers with them.
+    def dropMazeTimers(self):
+        self.playTimers.clear()
+        if self.pellets is not None:
+            self.timers.cancel(self.pellets.flashEvent)
+
     def resetLevel(self):
         self.pause.paused = False
         self.pacman.reset()
         self.ghosts.reset()
-        self.fruit = None
+        if self.fruit is not None:
+            self.removeFruit()
+
+    # Captures the complete simulation state (maze, entities, modes, timers,
+    # remaining pellets, score and lives) so restore() can go back to it without
+    # rebuilding the maze. The maze, pellet and entity objects are shared with
+    # the snapshot; only their mutable state is copied.
+    def snapshot(self):
+        state = {
+            "level": self.level,
+            "lives": self.lives,
+            "score": self.score,
+            "compiledmaze": self.compiledmaze,
+            "nodes": self.nodes,
+            "dangerfield": self.dangerfield,
+            "access": {
+                node.id: {direction: list(names) for direction, names in node.access.items()}
+                for node in self.nodes.nodeList
+                if node.restricted
+            },
+            "pellets": self.pellets,
+            "pelletState": self.pellets.snapshot(),
+            "pelletfield": self.pelletfield,
+            "pelletfieldState": self.pelletfield.snapshot(),
+            "pacman": self.pacman,
+            "pacmanState": self.pacman.snapshot(),
+            "ghosts": self.ghosts,
+            "ghostStates": [ghost.snapshot() for ghost in self.ghosts],
+            "collisions": self.collisions,
+            "fruit": self.fruit,
+            "fruitState": None if self.fruit is None else self.fruit.snapshot(),
+            "fruitCaptured": list(self.fruitCaptured),
+            "pause": (self.pause.paused, self.pause.event, self.pause.func),
+            "timers": self.timers.snapshot(),
+            "playTimers": self.playTimers.snapshot(),
+            "flash": (self.flashBG, self.flashTimer),
+        }
+        if not self.headless:
+            state["mazesprites"] = self.mazesprites
+            state["backgrounds"] = (
+                self.background_norm,
+                self.background_flash,
+                self.background,
+            )
+        return state
+
+    def restore(self, state):
+        self.tick += 1
+        self.level = state["level"]
+        self.lives = state["lives"]
+        self.score = state["score"]
+        self.compiledmaze = state["compiledmaze"]
+        self.nodes = state["nodes"]
+        self.dangerfield = state["dangerfield"]
+        for node in self.nodes.nodeList:
+            if node.id in state["access"]:
+                access = state["access"][node.id]
+                node.access = {direction: list(names) for direction, names in access.items()}
+                node.restricted = True
+            elif node.restricted:
+                node.resetAccess()
+
+        self.pellets = state["pellets"]
+        self.pellets.restore(state["pelletState"])
+        self.pelletfield = state["pelletfield"]
+        self.pelletfield.restore(state["pelletfieldState"])
+
+        self.pacman = state["pacman"]
+        self.pacman.restore(state["pacmanState"], self.nodes)
+        # the ghosts and the fruit file themselves again as they're restored
+        self.collisions = state["collisions"]
+        self.collisions.clear()
+        self.ghosts = state["ghosts"]
+        for ghost, ghostState in zip(self.ghosts, state["ghostStates"]):
+            ghost.pacman = self.pacman
+            ghost.restore(ghostState, self.nodes)
+        self.fruit = state["fruit"]
+        if self.fruit is not None:
+            self.fruit.restore(state["fruitState"], self.nodes)
+        self.fruitCaptured = list(state["fruitCaptured"])
+
+        self.pause.paused, self.pause.event, self.pause.func = state["pause"]
+        self.timers.restore(state["timers"])
+        self.playTimers.restore(state["playTimers"])
+        self.flashBG, self.flashTimer = state["flash"]
+        if not self.headless:
+            self.mazesprites = state["mazesprites"]
+            self.background_norm, self.background_flash, self.background = state["backgrounds"]
+            # labels and life icons are only ever drawn when rendering
+            self.textgroup.updateScore(self.score)
+            self.textgroup.updateLevel(self.level)
+            self.lifesprites.resetLives(self.lives)
 
     def updateScore(self, points):
         self.score += points
@@ -362,38 +514,23 @@ class GameController(object):
     def downSafe(self):
         return self.getNodesSafe(DOWN)
 
+    # The danger field is only brought up to date when it is read, so frames
+    # nobody looks at it in don't each rerun its BFS.
+    def getDangerField(self):
+        if self.dangerTick != self.tick:
+            self.dangerfield.update(self.ghosts)
+            self.dangerTick = self.tick
+        return self.dangerfield
+
+    # A direction is safe when no hunting ghost is heading for any of the next
+    # few nodes that way (see GhostDangerField).
     def getNodesSafe(self, direction):
-        nodes = []
-        currentNode = self.pacman.node
-        lastDirection = STOP
-        ghostNodes = []
-        for g in self.ghosts:
-            if g.mode.current in [SCATTER, CHASE]:
-                ghostNodes.append((g.target.position.x, g.target.position.y))
-        for i in range(6):
-            if currentNode.neighbors[direction] is not None:
-                currentNode = currentNode.neighbors[direction]
-                # lastDirection=direction
-                nodeTuple = (currentNode.position.x, currentNode.position.y)
-                if nodeTuple in ghostNodes:
-                    nodes.append(-1)
-                else:
-                    nodes.append(0)
-            else:
-                return -1 not in nodes
-                
-            # elif i == 0:
-            #     return []
-            # else:
-            #     lastDirection, anyNeighbour = self.getAnyNeighbour(currentNode, lastDirection)
-            #     currentNode = anyNeighbour
-            # nodeTuple = (currentNode.position.x, currentNode.position.y)
-            # if nodeTuple in ghostNodes:
-            #     nodes.append(-1)
-            # else:
-            #     nodes.append(0)
-            # nodes.append((currentNode.position.x, currentNode.position.y))
-        return -1 not in nodes
+        return self.getDangerField().isSafe(self.pacman.node.id, direction)
+
+    # graded version of getNodesSafe: hops between the nearest hunting ghost
+    # and the next few nodes in direction
+    def getDanger(self, direction):
+        return self.getDangerField().getDanger(self.pacman.node.id, direction)
 
     def getAnyNeighbour(self, node, exludeDirection):
         for direction in [UP, DOWN, LEFT, RIGHT]:
@@ -403,18 +540,21 @@ class GameController(object):
             return exludeDirection, node.neighbors[PORTAL]
         print("PROBLEM", node.neighbors, exludeDirection)
 
+    # Heads for the pellet closest to Pac-Man's target node by path length. The
+    # pellet field gives both that pellet and the first node towards it.
     def getPelletDirection(self):
-        self.goal = self.getNewNearestPellet()
-        return self.goalDirectionDij(self.pacman.validDirections())
+        target = self.pacman.target.id
+        pellet = self.pelletfield.getNearestPellet(target)
+        if pellet is None:
+            nextPacmanNode = self.nodes.nodeKeys[target]
+        else:
+            self.goal = pellet.position
+            nextPacmanNode = self.nodes.nodeKeys[self.pelletfield.getNextNode(target)]
+        return self.goalDirectionDij(self.pacman.validDirections(), nextPacmanNode)
 
-    def goalDirectionDij(self, directions):
-        path = self.getDijkstraPath(directions)
+    def goalDirectionDij(self, directions, nextPacmanNode):
         pacmanTarget = self.pacman.target
         pacmanTarget = self.nodes.getVectorFromLUTNode(pacmanTarget)
-        path.append(pacmanTarget)
-        if len(path) == 1:
-            return choice(directions)
-        nextPacmanNode = path[1]
         if pacmanTarget[0] > nextPacmanNode[0] and 2 in directions : #left
             return 2
         if pacmanTarget[0] < nextPacmanNode[0] and -2 in directions : #right
@@ -428,38 +568,7 @@ class GameController(object):
                 return -1 * self.pacman.direction
             else:
                 return choice(directions)
-    
-    def getDijkstraPath(self, directions):
-        lastPacmanNode = (self.goal.x, self.goal.y)
-        pacmanTarget = self.pacman.target
-        pacmanTarget = self.nodes.getVectorFromLUTNode(pacmanTarget)
 
-        # previous_nodes, shortest_path = dijkstra(self.nodes, ghostTarget)
-        previous_nodes, shortest_path = dijkstra_or_a_star(self.nodes, pacmanTarget, a_star=True)
-        path = []
-        node = lastPacmanNode
-        while node != pacmanTarget:
-            path.append(node)
-            if node in previous_nodes:
-                node = previous_nodes[node]
-            else:
-                break
-        path.append(pacmanTarget)
-        path.reverse()
-        return path
-    
-    def getNewNearestPellet(self):
-        nearest_pellet = None
-        nearest_distance_squared = float('inf')
-        pacman_position = self.pacman.position
-        for pellet in self.pellets.pelletList:
-            pellet_position = pellet.position
-            distance_squared = (pellet_position - pacman_position).magnitudeSquared()
-            if distance_squared < nearest_distance_squared:
-                nearest_distance_squared = distance_squared
-                nearest_pellet = pellet
-        return nearest_pellet.position
-    
 if __name__ == "__main__":
     game = GameController()
     game.startGame()
@@ -0,0 +1,100 @@
+import heapq
+
+
+# Number of times dt has to be added to a timer starting at 0 before it
+# reaches time, with the same float additions a timer counting dt per frame
+# makes.
+def framesFor(time, dt):
+    timer = 0
+    frames = 0
+    while timer < time:
+        timer += dt
+        frames += 1
+    return frames
+
+
+# Timers keyed by when they run out, instead of each one adding dt to its own
+# counter every frame. With a fixed dt (headless) the clock counts frames and
+# a timer of time seconds lasts framesFor(time, dt) of them; an update() given
+# some other dt moves it on by that many frames' worth. Without one (the
+# window, where each frame takes however long it really took) the clock adds
+# up the dt update() is given, so timers keep to wall-clock time. afterTime()
+# books a function to run at the end of a frame and update() moves the clock
+# on and runs everything that is due, in the order it was booked. Every
+# booking gets an id the owner keeps to cancel() it; owners snapshot their
+# ids with their other state, so a restored Scheduler and its owners still
+# agree on what is pending.
+class Scheduler(object):
+    def __init__(self, dt=None):
+        self.dt = dt
+        self.now = 0
+        self.nextid = 0
+        self.queue = []
+        # bookings whose timer starts once the frame in progress is over
+        self.starting = []
+        self.cancelled = set()
+        self.frameCounts = {}
+
+    # How far the clock moves on while a timer of time seconds runs.
+    def duration(self, time):
+        if self.dt is None:
+            return time
+        frames = self.frameCounts.get(time)
+        if frames is None:
+            frames = self.frameCounts[time] = max(framesFor(time, self.dt), 1)
+        return frames
+
+    # Books func(*args) for when a timer of time seconds started now runs out,
+    # counting the frame in progress if there is one. Returns the booking's id.
+    def afterTime(self, time, func, *args):
+        self.nextid += 1
+        heapq.heappush(self.queue, (self.now + self.duration(time), self.nextid, func, args))
+        return self.nextid
+
+    # Same as afterTime(), but the timer starts once the frame in progress is
+    # over.
+    def afterTimeFromNext(self, time, func, *args):
+        self.nextid += 1
+        self.starting.append((self.duration(time), self.nextid, func, args))
+        return self.nextid
+
+    def cancel(self, id):
+        if id is not None:
+            self.cancelled.add(id)
+
+    # Moves the clock on by a frame of dt and runs what is due by then.
+    def update(self, dt):
+        if self.dt is None:
+            end = self.now + dt
+        elif dt == self.dt:
+            end = self.now + 1
+        else:
+            end = self.now + dt / self.dt
+        queue = self.queue
+        while queue and queue[0][0] <= end:
+            due, id, func, args = heapq.heappop(queue)
+            if id in self.cancelled:
+                self.cancelled.discard(id)
+            else:
+                # what func books again counts from when this was due
+                self.now = max(self.now, due)
+                func(*args)
+        self.now = end
+        for duration, id, func, args in self.starting:
+            heapq.heappush(queue, (end + duration, id, func, args))
+        self.starting = []
+
+    # Forgets every booking, as when the maze and everything on it is replaced.
+    def clear(self):
+        self.queue = []
+        self.starting = []
+        self.cancelled = set()
+
+    def snapshot(self):
+        return (self.now, self.nextid, list(self.queue), list(self.starting), set(self.cancelled))
+
+    def restore(self, state):
+        self.now, self.nextid, queue, starting, cancelled = state
+        self.queue = list(queue)
+        self.starting = list(starting)
+        self.cancelled = set(cancelled)
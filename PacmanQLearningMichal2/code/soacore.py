@@ -0,0 +1,185 @@
+from __future__ import annotations
+
+import numpy as np
+
+from constants import DOWN, LEFT, PORTAL, RIGHT, STOP, TILEWIDTH, UP
+
+# Direction constants are small ints in [-2, 2]; DIRECTIONINDEX[direction + 2]
+# is their column in the arrays below (UP, DOWN, LEFT, RIGHT, then STOP).
+DIRECTIONS = np.array([UP, DOWN, LEFT, RIGHT, STOP], dtype=np.int64)
+DIRECTIONINDEX = np.zeros(5, dtype=np.int64)
+DIRECTIONINDEX[DIRECTIONS + 2] = np.arange(5)
+DIRECTIONVECTORS = np.array([[0, -1], [0, 1], [-1, 0], [1, 0], [0, 0]], dtype=np.float64)
+
+# How an entity picks its direction when it reaches a node: Pac-Man's
+# learntDirection, Entity.goalDirection or Entity.randomDirection.
+LEARNT = 0
+GOAL = 1
+RANDOM = 2
+
+
+# Movement of many entities in many games of the same maze, kept as NumPy
+# arrays with one row per entity (games * entitiesPerGame rows, Pac-Man first
+# in each game) instead of Entity objects. step() does what Entity.update and
+# Pacman.update do for every entity at once: move, detect overshooting the
+# target node, choose the next direction (with the same access rules, portals
+# and tie-breaking) and test Pac-Man against everything else in his game.
+# load() and store() copy entity state from and back to the object entities.
+# Sprites, modes and pellets stay with the objects.
+class EntityArrays(object):
+    def __init__(self, nodes, games: int, entitiesPerGame: int = 5, seed: int | None = None) -> None:
+        self.games = games
+        self.entitiesPerGame = entitiesPerGame
+        count = games * entitiesPerGame
+        self.nodePositions = np.array(nodes.nodeKeys, dtype=np.float64)
+        # neighbor ids per node in UP, DOWN, LEFT, RIGHT, PORTAL order, -1 for none
+        self.neighbors = np.full((len(nodes.nodeList), 5), -1, dtype=np.int64)
+        for node in nodes.nodeList:
+            for i, direction in enumerate([UP, DOWN, LEFT, RIGHT, PORTAL]):
+                if node.neighbors[direction] is not None:
+                    self.neighbors[node.id, i] = node.neighbors[direction].id
+        # access[row, node, d]: the entity in row may leave node in direction d
+        self.access = np.ones((count, len(nodes.nodeList), 4), dtype=np.bool_)
+
+        self.position = np.zeros((count, 2), dtype=np.float64)
+        self.direction = np.zeros(count, dtype=np.int64)
+        self.speed = np.zeros(count, dtype=np.float64)
+        self.node = np.zeros(count, dtype=np.int64)
+        self.target = np.zeros(count, dtype=np.int64)
+        self.collideRadius = np.zeros(count, dtype=np.float64)
+        self.disablePortal = np.zeros(count, dtype=np.bool_)
+        self.policy = np.full(count, GOAL, dtype=np.int64)
+        self.learntDirection = np.zeros(count, dtype=np.int64)
+        self.goal = np.zeros((count, 2), dtype=np.float64)
+        self.rng = np.random.default_rng(seed)
+
+    def rows(self, game: int) -> range:
+        return range(game * self.entitiesPerGame, (game + 1) * self.entitiesPerGame)
+
+    # Copies the entities of one game (Pac-Man first) and their access rules
+    # on that game's NodeGroup into the arrays.
+    def load(self, game: int, entities, nodes) -> None:
+        for row, entity in zip(self.rows(game), entities):
+            self.position[row] = entity.position.asTuple()
+            self.direction[row] = entity.direction
+            self.speed[row] = entity.speed
+            self.node[row] = entity.node.id
+            self.target[row] = entity.target.id
+            self.collideRadius[row] = entity.collideRadius
+            self.disablePortal[row] = entity.disablePortal
+            if hasattr(entity, "learntDirection"):
+                self.policy[row] = LEARNT
+                self.learntDirection[row] = entity.learntDirection
+            elif entity.directionMethod.__name__ == "randomDirection":
+                self.policy[row] = RANDOM
+            else:
+                self.policy[row] = GOAL
+            if entity.goal is not None:
+                self.goal[row] = entity.goal.asTuple()
+            for node in nodes.nodeList:
+                for i, direction in enumerate([UP, DOWN, LEFT, RIGHT]):
+                    self.access[row, node.id, i] = entity.name in node.access[direction]
+
+    # Writes positions, directions and nodes back into the entity objects.
+    def store(self, game: int, entities, nodes) -> None:
+        for row, entity in zip(self.rows(game), entities):
+            entity.position.set(*self.position[row].tolist())
+            entity.direction = int(self.direction[row])
+            entity.node = nodes.nodeList[self.node[row]]
+            entity.target = nodes.nodeList[self.target[row]]
+            entity.updateCell()
+
+    # Whether rows may move in directions from nodes: Entity.validDirection.
+    def validDirection(self, rows, nodes, directions):
+        index = DIRECTIONINDEX[directions + 2]
+        moving = index < 4
+        index = np.minimum(index, 3)
+        return (
+            moving
+            & self.access[rows, nodes, index]
+            & (self.neighbors[nodes, index] >= 0)
+        )
+
+    # Target of rows at nodes when heading in directions: Entity.getNewTarget.
+    def newTarget(self, rows, nodes, directions):
+        index = np.minimum(DIRECTIONINDEX[directions + 2], 3)
+        valid = self.validDirection(rows, nodes, directions)
+        return np.where(valid, self.neighbors[nodes, index], nodes)
+
+    # Advances every entity by dt. Returns a (games, entitiesPerGame - 1) mask
+    # of which other entities collide with each game's Pac-Man.
+    def step(self, dt: float) -> np.ndarray:
+        steps = DIRECTIONVECTORS[DIRECTIONINDEX[self.direction + 2]] * (self.speed * dt)[:, None]
+        self.position += steps
+
+        nodePositions = self.nodePositions
+        start = nodePositions[self.node]
+        toTarget = nodePositions[self.target] - start
+        toSelf = self.position - start
+        overshot = (toSelf[:, 0] ** 2 + toSelf[:, 1] ** 2) >= (
+            toTarget[:, 0] ** 2 + toTarget[:, 1] ** 2
+        )
+        rows = np.flatnonzero(overshot)
+        if len(rows):
+            self.arrive(rows)
+
+        radius = self.collideRadius.reshape(self.games, self.entitiesPerGame)
+        position = self.position.reshape(self.games, self.entitiesPerGame, 2)
+        offset = position[:, 1:] - position[:, :1]
+        distance = offset[:, :, 0] ** 2 + offset[:, :, 1] ** 2
+        return distance <= (radius[:, :1] + radius[:, 1:]) ** 2
+
+    # What happens in Entity.update once rows have overshot their target.
+    def arrive(self, rows):
+        node = self.target[rows]
+        direction = self.direction[rows]
+        policy = self.policy[rows]
+
+        # Entity.validDirections: valid moves except reversing, unless that's all
+        candidates = np.empty((len(rows), 4), dtype=np.bool_)
+        for i in range(4):
+            candidates[:, i] = self.validDirection(rows, node, np.full(len(rows), DIRECTIONS[i])) & (
+                DIRECTIONS[i] != -direction
+            )
+        stuck = ~candidates.any(axis=1)
+
+        chosen = np.empty(len(rows), dtype=np.int64)
+        learnt = policy == LEARNT
+        chosen[learnt] = self.learntDirection[rows[learnt]]
+
+        # Entity.goalDirection: first candidate whose tile ahead is closest to the goal
+        goal = policy == GOAL
+        if goal.any():
+            ahead = (
+                self.nodePositions[node[goal]][:, None, :]
+                + DIRECTIONVECTORS[None, :4, :] * TILEWIDTH
+                - self.goal[rows[goal]][:, None, :]
+            )
+            distances = ahead[:, :, 0] ** 2 + ahead[:, :, 1] ** 2
+            distances[~candidates[goal]] = np.inf
+            chosen[goal] = DIRECTIONS[np.argmin(distances, axis=1)]
+
+        random = policy == RANDOM
+        if random.any():
+            counts = np.maximum(candidates[random].sum(axis=1), 1)
+            picks = (self.rng.random(len(counts)) * counts).astype(np.int64)
+            order = np.cumsum(candidates[random], axis=1) - 1
+            first = np.argmax(candidates[random] & (order == picks[:, None]), axis=1)
+            chosen[random] = DIRECTIONS[first]
+
+        steered = ~learnt & stuck
+        chosen[steered] = -direction[steered]
+
+        portal = self.neighbors[node, 4]
+        jumps = ~self.disablePortal[rows] & (portal >= 0)
+        node = np.where(jumps, portal, node)
+
+        target = self.newTarget(rows, node, chosen)
+        turned = target != node
+        direction = np.where(turned, chosen, direction)
+        target = np.where(turned, target, self.newTarget(rows, node, direction))
+
+        self.node[rows] = node
+        self.target[rows] = target
+        self.direction[rows] = direction
+        self.position[rows] = self.nodePositions[node]
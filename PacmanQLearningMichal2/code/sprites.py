@@ -25,13 +25,25 @@ DEATH = 5
 
 
 class Spritesheet(object):
+    # every sprite shares one loaded and scaled sheet, so restarting a game
+    # doesn't decode the png again for each entity
+    loaded = None
+
     def __init__(self):
-        self.sheet = pygame.image.load("spritesheet_mspacman.png").convert()
-        transcolor = self.sheet.get_at((0, 0))
-        self.sheet.set_colorkey(transcolor)
-        width = int(self.sheet.get_width() / BASETILEWIDTH * TILEWIDTH)
-        height = int(self.sheet.get_height() / BASETILEHEIGHT * TILEHEIGHT)
-        self.sheet = pygame.transform.scale(self.sheet, (width, height))
+        if Spritesheet.loaded is None:
+            Spritesheet.loaded = self.loadSheet()
+        self.sheet = Spritesheet.loaded
+
+    def loadSheet(self):
+        sheet = pygame.image.load("spritesheet_mspacman.png")
+        # convert() needs a display, which headless games never create
+        if pygame.display.get_surface() is not None:
+            sheet = sheet.convert()
+        transcolor = sheet.get_at((0, 0))
+        sheet.set_colorkey(transcolor)
+        width = int(sheet.get_width() / BASETILEWIDTH * TILEWIDTH)
+        height = int(sheet.get_height() / BASETILEHEIGHT * TILEHEIGHT)
+        return pygame.transform.scale(sheet, (width, height))
 
     def getImage(self, x, y, width, height):
         x *= TILEWIDTH
@@ -179,10 +191,14 @@ class LifeSprites(Spritesheet):
 
 
 class MazeSprites(Spritesheet):
-    def __init__(self, mazefile, rotfile):
+    def __init__(self, mazefile, rotfile, compiled=None):
         Spritesheet.__init__(self)
-        self.data = self.readMazeFile(mazefile)
-        self.rotdata = self.readMazeFile(rotfile)
+        if compiled is not None:
+            self.data = compiled.data
+            self.rotdata = compiled.rotdata
+        else:
+            self.data = self.readMazeFile(mazefile)
+            self.rotdata = self.readMazeFile(rotfile)
 
     def getImage(self, x, y):  # type:ignore
         return Spritesheet.getImage(self, x, y, TILEWIDTH, TILEHEIGHT)
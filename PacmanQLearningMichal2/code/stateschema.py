@@ -0,0 +1,101 @@
+from __future__ import annotations
+
+
+# One component of a state: the feature it holds (a name from features.py)
+# and how many distinct values it can take. toCode/fromCode map a value to an
+# int in [0, size) and back.
+class Field(object):
+    def __init__(self, name: str, size: int) -> None:
+        self.name = name
+        self.size = size
+
+    def toCode(self, value) -> int:
+        code = int(value)
+        if not 0 <= code < self.size:
+            raise ValueError("{}: {} is outside [0, {})".format(self.name, value, self.size))
+        return code
+
+    def fromCode(self, code: int):
+        return code
+
+    def __str__(self) -> str:
+        return "{}: {}".format(self.name, self.size)
+
+
+class FlagField(Field):
+    def __init__(self, name: str) -> None:
+        Field.__init__(self, name, 2)
+
+    def toCode(self, value) -> int:
+        return 1 if value else 0
+
+    def fromCode(self, code: int) -> bool:
+        return bool(code)
+
+
+# A value out of a fixed list, coded by its index in the list.
+class ChoiceField(Field):
+    def __init__(self, name: str, values: list) -> None:
+        Field.__init__(self, name, len(values))
+        self.values = list(values)
+        self.codes = {value: code for code, value in enumerate(self.values)}
+
+    def toCode(self, value) -> int:
+        if value not in self.codes:
+            raise ValueError("{}: {} is not one of {}".format(self.name, value, self.values))
+        return self.codes[value]
+
+    def fromCode(self, code: int):
+        return self.values[code]
+
+
+# A pixel (x, y) position, coded by the cell of a columns x rows grid of
+# unit-sized cells it falls in, row by row.
+class PositionField(Field):
+    def __init__(self, name: str, unit: int, columns: int, rows: int) -> None:
+        Field.__init__(self, name, columns * rows)
+        self.unit = unit
+        self.columns = columns
+        self.rows = rows
+
+    def toCode(self, value) -> int:
+        column = int(value[0]) // self.unit
+        row = int(value[1]) // self.unit
+        if not (0 <= column < self.columns and 0 <= row < self.rows):
+            raise ValueError("{}: {} is outside the grid".format(self.name, value))
+        return row * self.columns + column
+
+    def fromCode(self, code: int) -> tuple[int, int]:
+        row, column = divmod(code, self.columns)
+        return (column * self.unit, row * self.unit)
+
+
+# An ordered list of fields describing what a State holds. States are coded
+# as mixed-radix numbers with the first field as the most significant digit,
+# so every code falls in [0, size) and a dense Q-table needs exactly size rows.
+class StateSchema(object):
+    def __init__(self, fields: list[Field]) -> None:
+        self.fields = list(fields)
+        self.names = [field.name for field in self.fields]
+        self.size = 1
+        for field in self.fields:
+            self.size *= field.size
+
+    def encode(self, values) -> int:
+        code = 0
+        for field, value in zip(self.fields, values):
+            code = code * field.size + field.toCode(value)
+        return code
+
+    def decode(self, code: int) -> list:
+        if not 0 <= code < self.size:
+            raise ValueError("state code {} is outside [0, {})".format(code, self.size))
+        values = []
+        for field in reversed(self.fields):
+            code, digit = divmod(code, field.size)
+            values.append(field.fromCode(digit))
+        values.reverse()
+        return values
+
+    def __str__(self) -> str:
+        return "{} states ({})".format(self.size, ", ".join(str(field) for field in self.fields))
@@ -21,10 +21,8 @@ class Text(object):
         self.size = size
         self.visible = visible
         self.position = Vector2(x, y)
-        self.timer = 0
         self.lifespan = time
         self.label = None
-        self.destroy = False
         self.setupFont("PressStart2P-Regular.ttf")
         self.createLabel()
 
@@ -38,22 +36,17 @@ class Text(object):
         self.text = str(newtext)
         self.createLabel()
 
-    def update(self, dt):
-        if self.lifespan is not None:
-            self.timer += dt
-            if self.timer >= self.lifespan:
-                self.timer = 0
-                self.lifespan = None
-                self.destroy = True
-
     def render(self, screen):
         if self.visible:
             x, y = self.position.asTuple()
             screen.blit(self.label, (x, y))
 
 
+# Texts with a lifespan are removed by an event booked on timers, the
+# Scheduler that runs at the end of every frame.
 class TextGroup(object):
-    def __init__(self):
+    def __init__(self, timers):
+        self.timers = timers
         self.nextid = 10
         self.alltext = {}
         self.setupText()
@@ -62,11 +55,18 @@ class TextGroup(object):
     def addText(self, text, color, x, y, size, time=None, id=None):
         self.nextid += 1
         self.alltext[self.nextid] = Text(text, color, x, y, size, time=time, id=id)
+        if time is not None:
+            # a text starts ageing in the frame after it's added
+            self.timers.afterTimeFromNext(time, self.expireText, self.nextid)
         return self.nextid
 
     def removeText(self, id):
         self.alltext.pop(id)
 
+    # restoring a snapshot can bring back the event of a text already gone
+    def expireText(self, id):
+        self.alltext.pop(id, None)
+
     def setupText(self):
         size = TILEHEIGHT
         self.alltext[SCORETXT] = Text("0".zfill(8), WHITE, 0, TILEHEIGHT, size)
@@ -85,12 +85,6 @@ class TextGroup(object):
         self.addText("SCORE", WHITE, 0, 0, size)
         self.addText("LEVEL", WHITE, 23 * TILEWIDTH, 0, size)
 
-    def update(self, dt):
-        for tkey in list(self.alltext.keys()):
-            self.alltext[tkey].update(dt)
-            if self.alltext[tkey].destroy:
-                self.removeText(tkey)
-
     def showText(self, id):
         self.hideText()
         self.alltext[id].visible = True
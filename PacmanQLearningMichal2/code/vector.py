@@ -1,11 +1,17 @@
 import math
 
 
+# The arithmetic operators return new vectors. The methods below them work in
+# place (or write into an existing vector) for the per-frame entity code, which
+# would otherwise allocate several temporaries per entity every frame. Only
+# use them on vectors the caller owns: node and pellet positions are shared.
 class Vector2(object):
+    __slots__ = ("x", "y")
+    thresh = 0.000001
+
     def __init__(self, x=0, y=0):
         self.x = x
         self.y = y
-        self.thresh = 0.000001
 
     def __add__(self, other):
         return Vector2(self.x + other.x, self.y + other.y)
@@ -35,6 +41,47 @@ class Vector2(object):
                 return True
         return False
 
+    def set(self, x, y):
+        self.x = x
+        self.y = y
+        return self
+
+    def setFrom(self, other):
+        self.x = other.x
+        self.y = other.y
+        return self
+
+    def iadd(self, other):
+        self.x += other.x
+        self.y += other.y
+        return self
+
+    def isub(self, other):
+        self.x -= other.x
+        self.y -= other.y
+        return self
+
+    def imul(self, scalar):
+        self.x *= scalar
+        self.y *= scalar
+        return self
+
+    # self += other * scalar
+    def iaddScaled(self, other, scalar):
+        self.x += other.x * scalar
+        self.y += other.y * scalar
+        return self
+
+    # out = self - other
+    def subInto(self, other, out):
+        out.x = self.x - other.x
+        out.y = self.y - other.y
+        return out
+
+    # (self - other).magnitudeSquared(), without the intermediate vector
+    def distanceSquared(self, other):
+        return (self.x - other.x) ** 2 + (self.y - other.y) ** 2
+
     def magnitudeSquared(self):
         return self.x**2 + self.y**2
 